@@ -15,7 +15,12 @@ class SimpleAuth:
         self.load_users()
 
     def load_users(self):
-        """Load users from file or create defaults"""
+        """
+        Load users from file
+        Without a users file the default users are created at the first
+        login (or ahead of time with `python auth.py`), so starting a
+        dashboard process never waits on bcrypt
+        """
         self.users = {}
 
         if self.users_file.exists():
@@ -24,18 +29,23 @@ class SimpleAuth:
                     if ':' in line:
                         username, password_hash = line.strip().split(':', 1)
                         self.users[username] = password_hash
-        else:
-            # Create default users
-            self.add_user("admin", os.getenv("ADMIN_PASSWORD", "changeme123"))
-            self.add_user("manager", os.getenv("MANAGER_PASSWORD", "changeme456"))
-            self.add_user("viewer", os.getenv("VIEWER_PASSWORD", "changeme789"))
-            self.save_users()
+
+    def create_default_users(self):
+        """Create the default users with passwords from the environment"""
+        self.users = {
+            "admin": self.hash_password(os.getenv("ADMIN_PASSWORD", "changeme123")),
+            "manager": self.hash_password(os.getenv("MANAGER_PASSWORD", "changeme456")),
+            "viewer": self.hash_password(os.getenv("VIEWER_PASSWORD", "changeme789")),
+        }
+        self.save_users()
 
     def save_users(self):
-        """Save users to file"""
-        with open(self.users_file, 'w') as f:
+        """Save users to file atomically (other dashboard processes read it)"""
+        tmp_path = self.users_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
             for username, password_hash in self.users.items():
                 f.write(f"{username}:{password_hash}\n")
+        os.replace(tmp_path, self.users_file)
 
     def hash_password(self, password):
         """Hash a password"""
@@ -51,7 +61,16 @@ class SimpleAuth:
         self.save_users()
 
     def authenticate(self, username, password):
-        """Authenticate a user"""
+        """
+        Authenticate a user
+        A process started before the users file existed reads it now (another
+        dashboard worker may have created it), or creates the default users
+        """
+        if not self.users:
+            if self.users_file.exists():
+                self.load_users()
+            else:
+                self.create_default_users()
         if username in self.users:
             return self.verify_password(password, self.users[username])
         return False
@@ -63,3 +82,13 @@ class SimpleAuth:
             self.save_users()
             return True
         return False
+
+
+if __name__ == "__main__":
+    # Create the default users before the dashboard starts
+    auth = SimpleAuth()
+    if auth.users:
+        print(f"Users file exists: {auth.users_file} ({len(auth.users)} users)")
+    else:
+        auth.create_default_users()
+        print(f"Created default users in {auth.users_file}")
@@ -4,22 +4,35 @@ Watches the financials directory for new files and processes them automatically
 """
 
 import time
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from database import FinancialDatabase
 from process_financials import process_pdf, process_csv
-from config import FINANCIALS_DIR, LOGS_DIR
+from config import FINANCIALS_DIR, LOGS_DIR, AUTO_PROCESS_JOBS
 from datetime import datetime
 
 
 class FinancialFileHandler(FileSystemEventHandler):
-    """Handles new financial statement files"""
-
-    def __init__(self):
+    """
+    Handles new financial statement files
+    Files are handed to a pool of processing threads, so the watchdog
+    thread never waits on a parse. Each PDF is parsed in an isolated worker
+    process with a timeout and memory limit; database writes are serialized.
+    """
+
+    def __init__(self, jobs=AUTO_PROCESS_JOBS):
         self.db = FinancialDatabase()
+        self.db_lock = threading.Lock()
+        # Make sure the dashboard has a snapshot to read from the start
+        self.db.publish_snapshot()
         self.processing = set()  # Track files being processed
+        self.processing_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="process")
         self.log_file = LOGS_DIR / f"auto_process_{datetime.now().strftime('%Y%m%d')}.log"
+        self.log_lock = threading.Lock()
 
     def log(self, message):
         """Log message to file and console"""
@@ -27,7 +40,7 @@ class FinancialFileHandler(FileSystemEventHandler):
         log_message = f"[{timestamp}] {message}"
         print(log_message)
 
-        with open(self.log_file, 'a') as f:
+        with self.log_lock, open(self.log_file, 'a') as f:
             f.write(log_message + '\n')
 
     def on_created(self, event):
@@ -42,11 +55,15 @@ class FinancialFileHandler(FileSystemEventHandler):
             return
 
         # Avoid processing the same file multiple times
-        if file_path in self.processing:
-            return
+        with self.processing_lock:
+            if file_path in self.processing:
+                return
+            self.processing.add(file_path)
 
-        self.processing.add(file_path)
+        self.executor.submit(self.process_file, file_path)
 
+    def process_file(self, file_path):
+        """Process one file (runs on a processing thread)"""
         # Wait a moment to ensure file is fully written
         time.sleep(2)
 
@@ -54,16 +71,18 @@ class FinancialFileHandler(FileSystemEventHandler):
 
         try:
             if file_path.suffix == '.pdf':
-                success = process_pdf(file_path, self.db)
+                success = process_pdf(file_path, self.db, db_lock=self.db_lock)
             elif file_path.name.startswith('manual_entry_') and file_path.suffix == '.csv':
-                success = process_csv(file_path, self.db)
+                with self.db_lock:
+                    success = process_csv(file_path, self.db)
             else:
                 self.log(f"Skipping non-financial file: {file_path.name}")
-                self.processing.remove(file_path)
                 return
 
             if success:
                 self.log(f"✓ Successfully processed: {file_path.name}")
+                with self.db_lock:
+                    self.db.publish_snapshot()
             else:
                 self.log(f"✗ Failed to process: {file_path.name}")
 
@@ -71,7 +90,8 @@ class FinancialFileHandler(FileSystemEventHandler):
             self.log(f"✗ Error processing {file_path.name}: {e}")
 
         finally:
-            self.processing.remove(file_path)
+            with self.processing_lock:
+                self.processing.discard(file_path)
 
     def on_modified(self, event):
         """Handle file modifications (treat as new file)"""
@@ -99,9 +119,11 @@ def run_auto_processor():
     except KeyboardInterrupt:
         print("\nStopping automated processor...")
         observer.stop()
-        event_handler.db.close()
 
     observer.join()
+    # Let files already being processed finish before closing the database
+    event_handler.executor.shutdown(wait=True)
+    event_handler.db.close()
     print("Automated processor stopped.")
 
 
@@ -0,0 +1,555 @@
+"""
+Parser benchmark suite
+Generates synthetic statement PDFs with known values (our line items,
+accounting number formats, 1-40 pages, single statement and _ALL files),
+times parse_pdf stage by stage and scores accuracy against the generated
+values. Results are written to a JSON file that can be compared between
+commits to catch speed or accuracy regressions. The run fails when a
+mode reads fewer values correctly than full table detection, when the
+text tier misreads one of the amount formats in TEXT_AMOUNT_CASES, or
+when a month sent as separate IS/BS/CF files does not load or re-match
+every statement.
+
+Usage:
+    python benchmark_parser.py                         # run, write logs/parser_benchmark.json
+    python benchmark_parser.py --output new.json --compare old.json
+"""
+
+import io
+import sys
+import json
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from pdf_parser import FinancialStatementParser, PARSER_VERSION, PARSE_STAGES
+from layout_templates import LayoutTemplateStore
+from database import FinancialDatabase, LINE_ITEM_TABLES
+from process_financials import result_rows
+from config import PNL_LINE_ITEMS, BALANCE_SHEET_ITEMS, CASH_FLOW_ITEMS, LOCATIONS, LOGS_DIR
+
+DEFAULT_OUTPUT = LOGS_DIR / "parser_benchmark.json"
+
+# Benchmark files: (name, statement type, page count, amount format)
+BENCHMARK_CASES = [
+    ("IS_1p", "IS", 1, "dollar"),
+    ("IS_8p", "IS", 8, "parens"),
+    ("BS_2p", "BS", 2, "minus"),
+    ("ALL_3p", "ALL", 3, "dollar"),
+    ("ALL_10p", "ALL", 10, "trailing_minus"),
+    ("ALL_20p", "ALL", 20, "whole"),
+    ("ALL_40p", "ALL", 40, "parens"),
+    ("IS_2p", "IS", 2, "accounting"),
+]
+
+# Parser configurations: text tier first (the default path), learned
+# layout templates, and full table detection only
+BENCHMARK_MODES = {
+    'text': {'tiered': True},
+    'template': {'tiered': False, 'learn_layouts': True},
+    'tables': {'tiered': False},
+}
+
+# Statement text lines, the line item on them and the amount the text tier
+# must read (None: no amount on the line)
+TEXT_AMOUNT_CASES = [
+    ("Rent ($1,234.56) 12.0%", "Rent", -1234.56),
+    ("Rent $ (1,234.56) 12.0%", "Rent", -1234.56),
+    ("Rent $(1,234.56)", "Rent", -1234.56),
+    ("Food Sales -2,000.00 3.1%", "Food Sales", -2000.00),
+    ("Supplies 3,000.00- 2.0%", "Supplies", -3000.00),
+    ("Utilities $ - 30.3%", "Utilities", 0.0),
+    ("Repairs & Maintenance - 4.1%", "Repairs & Maintenance", 0.0),
+    ("Total Revenue $217,919.58 14.8%", "Total Revenue", 217919.58),
+    ("Labor\n(5,502.97)", "Labor", -5502.97),
+    ("Marketing - Digital\n1,500.00", "Marketing", 1500.00),
+    ("Insurance 14.8%", "Insurance", None),
+]
+
+STATEMENT_TITLES = {
+    'IS': ("Income Statement", PNL_LINE_ITEMS),
+    'BS': ("Balance Sheet", BALANCE_SHEET_ITEMS),
+    'CF': ("Statement of Cash Flows", CASH_FLOW_ITEMS),
+}
+
+RESULT_KEYS = {'IS': 'pnl_data', 'BS': 'balance_sheet_data', 'CF': 'cash_flow_data'}
+
+BENCHMARK_LOCATION = "ANN"
+BENCHMARK_YEAR = 2026
+BENCHMARK_MONTH = 1
+
+# Letter page in PDF points
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+ROW_HEIGHT = 16
+
+# Helvetica advance widths (1/1000 em) for right-aligning amounts
+HELVETICA_WIDTHS = {'0123456789$': 556, ',. ': 278, '()-': 333, '%': 889}
+
+
+def format_amount(value, style):
+    """Write an amount the way an accounting package would"""
+    if style == 'whole':
+        value = round(value)
+        digits = f"{abs(value):,.0f}"
+    else:
+        digits = f"{abs(value):,.2f}"
+
+    if value == 0:
+        return "$ -" if style in ('dollar', 'accounting') else "-"
+    if value > 0:
+        if style == 'accounting':
+            return f"$ {digits}"
+        return f"${digits}" if style == 'dollar' else digits
+    if style == 'dollar':
+        return f"(${digits})"
+    if style == 'accounting':
+        return f"$ ({digits})"
+    if style == 'minus':
+        return f"-{digits}"
+    if style == 'trailing_minus':
+        return f"{digits}-"
+    return f"({digits})"
+
+
+def text_width(text, size):
+    """Approximate width of Helvetica text in points"""
+    width = 0
+    for char in text:
+        width += next((w for chars, w in HELVETICA_WIDTHS.items() if char in chars), 556)
+    return width * size / 1000
+
+
+def pdf_string(text):
+    """Escape text for a PDF string literal"""
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PDFPage:
+    """Content stream for one page: Helvetica text and ruled lines"""
+
+    def __init__(self):
+        self.operations = []
+
+    def text(self, x, y, text, size=9, bold=False, align='left'):
+        """Draw text with its baseline at y, left- or right-aligned at x"""
+        if align == 'right':
+            x -= text_width(text, size)
+        font = 'F2' if bold else 'F1'
+        self.operations.append(f"BT /{font} {size} Tf {x:.2f} {y:.2f} Td {pdf_string(text)} Tj ET")
+
+    def line(self, x0, y0, x1, y1):
+        """Draw a 0.5pt line"""
+        self.operations.append(f"0.5 w {x0:.2f} {y0:.2f} m {x1:.2f} {y1:.2f} l S")
+
+    def table(self, top, columns, rows, aligns):
+        """
+        Draw a ruled table with its top edge at top
+        columns: x positions of the column edges (one more than cells per row)
+        """
+        bottom = top - ROW_HEIGHT * len(rows)
+        for i in range(len(rows) + 1):
+            y = top - ROW_HEIGHT * i
+            self.line(columns[0], y, columns[-1], y)
+        for x in columns:
+            self.line(x, top, x, bottom)
+        for i, row in enumerate(rows):
+            baseline = top - ROW_HEIGHT * (i + 1) + 5
+            for j, cell in enumerate(row):
+                if aligns[j] == 'right':
+                    self.text(columns[j + 1] - 4, baseline, cell, bold=(i == 0), align='right')
+                else:
+                    self.text(columns[j] + 4, baseline, cell, bold=(i == 0))
+
+    def content(self):
+        """Return the page content stream"""
+        return "\n".join(self.operations)
+
+
+def write_pdf(path, pages):
+    """Write PDFPages as a minimal PDF using the standard Helvetica fonts"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page in pages:
+        stream = page.content().encode('latin-1')
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode('latin-1')}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode('latin-1')
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    Path(path).write_bytes(output)
+
+
+def statement_page(rnd, location_name, code, style):
+    """
+    One statement page with a random amount for every line item
+    Returns: (PDFPage, {line_item: amount written})
+    """
+    title, items = STATEMENT_TITLES[code]
+    page = PDFPage()
+    page.text(50, 750, f"Mason's Famous Lobster Rolls - {location_name}", size=14, bold=True)
+    page.text(50, 730, f"{title} - January {BENCHMARK_YEAR}", size=11)
+
+    values = {}
+    rows = [["Account", "Amount", "% of Sales"]]
+    for item in items:
+        draw = rnd.random()
+        if draw < 0.05:
+            value = 0.0
+        elif draw < 0.2:
+            value = -round(rnd.uniform(100, 25000), 2)
+        else:
+            value = round(rnd.uniform(500, 400000), 2)
+        if style == 'whole':
+            value = float(round(value))
+        values[item] = value
+        rows.append([item, format_amount(value, style), f"{rnd.uniform(0, 40):.1f}%"])
+    page.table(700, [50, 330, 460, 560], rows, ['left', 'right', 'right'])
+    return page, values
+
+
+def detail_page(rnd, code, style):
+    """A general ledger detail page (no line items, so no tables are wanted)"""
+    title, _ = STATEMENT_TITLES[code]
+    page = PDFPage()
+    page.text(50, 750, f"{title} - Detail (continued)", size=11)
+    rows = [["GL Account", "Description", "Debit", "Credit"]]
+    for i in range(38):
+        rows.append([
+            str(rnd.randint(4000, 9999)),
+            f"Journal entry {rnd.randint(1000, 99999)}",
+            format_amount(round(rnd.uniform(0, 9000), 2), style),
+            format_amount(round(rnd.uniform(0, 9000), 2), style),
+        ])
+    page.table(720, [50, 140, 380, 470, 560], rows, ['left', 'left', 'right', 'right'])
+    return page
+
+
+def generate_statement_pdf(path, statement_type, page_count, style, seed):
+    """
+    Write a synthetic statement PDF: each statement page is followed by
+    detail pages until the file has page_count pages
+    Returns: {statement code: {line_item: amount}} of the values written
+    """
+    rnd = random.Random(seed)
+    codes = ['IS', 'BS', 'CF'] if statement_type == 'ALL' else [statement_type]
+    if page_count < len(codes):
+        raise ValueError(f"{statement_type} files need at least {len(codes)} pages")
+
+    location_name = LOCATIONS[BENCHMARK_LOCATION]['name']
+    pages = []
+    truth = {}
+    for i, code in enumerate(codes):
+        page, truth[code] = statement_page(rnd, location_name, code, style)
+        pages.append(page)
+        # Spread the detail pages over the statements
+        details = (page_count - len(codes)) // len(codes)
+        if i < (page_count - len(codes)) % len(codes):
+            details += 1
+        pages.extend(detail_page(rnd, code, style) for _ in range(details))
+
+    write_pdf(path, pages)
+    return truth
+
+
+def score(result, truth):
+    """
+    Compare a parse result with the generated values
+    Returns: dict of items expected, found and correct (within half a cent)
+    """
+    expected = found = correct = 0
+    for code, values in truth.items():
+        parsed = (result or {}).get(RESULT_KEYS[code], {})
+        for item, value in values.items():
+            expected += 1
+            if item in parsed:
+                found += 1
+                if abs(parsed[item] - value) < 0.005:
+                    correct += 1
+    return {
+        'items_expected': expected,
+        'items_found': found,
+        'items_correct': correct,
+        'accuracy': correct / expected if expected else 0.0,
+    }
+
+
+def check_text_amounts():
+    """
+    Match each of TEXT_AMOUNT_CASES with the text tier's line matching
+    Returns: list of failure descriptions
+    """
+    parser = FinancialStatementParser(use_cache=False, use_layouts=False, use_archive=False)
+    failures = []
+    for text, item, expected in TEXT_AMOUNT_CASES:
+        amount = parser.extract_statement_data(text, [], [item]).get(item)
+        if amount != expected:
+            failures.append(f"text {text!r}: {item} read as {amount}, expected {expected}")
+    return failures
+
+
+def split_file_results():
+    """
+    Parse results of a month sent as separate IS, BS and CF files
+    Returns: list of result dicts
+    """
+    results = []
+    for code, (_, items) in STATEMENT_TITLES.items():
+        results.append({
+            'location_code': BENCHMARK_LOCATION,
+            'year': BENCHMARK_YEAR,
+            'month': BENCHMARK_MONTH,
+            'file_name': f"{BENCHMARK_YEAR}-{BENCHMARK_MONTH:02d}_{BENCHMARK_LOCATION}_{code}.pdf",
+            'file_hash': f"{code}-hash",
+            'statement_type': code,
+            RESULT_KEYS[code]: {item: float(i + 1) for i, item in enumerate(items[:3])},
+        })
+    return results
+
+
+def check_split_file_loads():
+    """
+    Load a month sent as separate IS/BS/CF files in bulk and file by file
+    Every statement has to be loaded, loading the files again has to
+    change nothing, and re-matching changed archived amounts has to update
+    every statement.
+    Returns: list of failure descriptions
+    """
+    results = split_file_results()
+    failures = []
+
+    def row_counts(db):
+        return {table: db.conn.execute(f"SELECT count(*) FROM {table}").fetchall()[0][0]
+                for table in LINE_ITEM_TABLES}
+
+    with redirect_stdout(io.StringIO()):
+        db = FinancialDatabase(':memory:')
+        try:
+            db.bulk_load(*result_rows(results, lambda result: result['file_name']))
+            bulk_rows = row_counts(db)
+            again = db.bulk_load(*result_rows(results, lambda result: result['file_name']))
+        finally:
+            db.close()
+
+        db = FinancialDatabase(':memory:')
+        try:
+            for result in results:
+                db.add_statement_data(result['location_code'], result['year'], result['month'],
+                                      result['file_name'], result, result['file_hash'])
+            file_rows = row_counts(db)
+            statuses = [
+                db.add_statement_data(result['location_code'], result['year'], result['month'],
+                                      result['file_name'], result, result['file_hash'])[1]
+                for result in results
+            ]
+            rematched = [
+                {**result, RESULT_KEYS[result['statement_type']]: {
+                    item: amount + 1 for item, amount in result[RESULT_KEYS[result['statement_type']]].items()
+                }}
+                for result in results
+            ]
+            _, amounts = result_rows(rematched, lambda result: result['file_name'])
+            updated = db.upsert_changed_amounts(amounts)
+        finally:
+            db.close()
+
+    for table in LINE_ITEM_TABLES:
+        if not bulk_rows[table]:
+            failures.append(f"split files: bulk load left {table} empty")
+        if not file_rows[table]:
+            failures.append(f"split files: loading file by file left {table} empty")
+    if again['unchanged'] != len(results) or again['financial_statements'] != (0, 0):
+        failures.append(f"split files: bulk loading them again was not a no-op ({again})")
+    if statuses != ['unchanged'] * len(results):
+        failures.append(f"split files: loading them again file by file gave {statuses}")
+    for table in LINE_ITEM_TABLES:
+        if updated[table][1] != file_rows[table]:
+            failures.append(f"split files: re-matching updated {updated[table][1]} of {file_rows[table]} {table} rows")
+    return failures
+
+
+def tier_regressions(results, reference='tables'):
+    """
+    Compare each mode's accuracy with full table detection on every case
+    Returns: list of descriptions of modes less accurate than the reference
+    """
+    regressions = []
+    for name, case in results['cases'].items():
+        expected = case['modes'].get(reference)
+        if not expected:
+            continue
+        for mode, timing in case['modes'].items():
+            if timing['accuracy'] < expected['accuracy']:
+                regressions.append(f"{name} {mode}: accuracy {timing['accuracy']:.1%} "
+                                   f"below {reference} {expected['accuracy']:.1%}")
+    return regressions
+
+
+def benchmark_file(pdf_path, truth, mode, repeat, work_dir):
+    """
+    Parse one file repeat times with a parser configuration
+    Stage times are the medians over the repeats
+    Returns: dict of timings, extraction tier and accuracy
+    """
+    options = BENCHMARK_MODES[mode]
+    parser = FinancialStatementParser(use_cache=False, tiered=options['tiered'], use_layouts=False, use_archive=False)
+    if options.get('learn_layouts'):
+        parser.layouts = LayoutTemplateStore(Path(work_dir) / f"layouts_{mode}")
+        with redirect_stdout(io.StringIO()):
+            parser.parse_pdf(pdf_path)
+
+    totals = []
+    stages = {stage: [] for stage in PARSE_STAGES}
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = parser.parse_pdf(pdf_path)
+        totals.append(time.perf_counter() - start)
+        for stage in PARSE_STAGES:
+            stages[stage].append(parser.stage_times[stage])
+
+    return {
+        'tier': (result or {}).get('extraction_tier'),
+        'seconds': round(statistics.median(totals), 4),
+        'stages': {stage: round(statistics.median(times), 4) for stage, times in stages.items()},
+        **score(result, truth),
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(repeat=3, modes=None, keep_dir=None):
+    """
+    Generate the benchmark files and parse each one in every mode
+    Returns: benchmark results dict (as written to JSON)
+    """
+    modes = modes or list(BENCHMARK_MODES)
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parser_version': PARSER_VERSION,
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'cases': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_dir = Path(keep_dir or tmp_dir)
+        pdf_dir.mkdir(parents=True, exist_ok=True)
+
+        for seed, (name, statement_type, page_count, style) in enumerate(BENCHMARK_CASES):
+            # One directory per case, since the parser reads the period and
+            # location from the file name
+            case_dir = pdf_dir / name
+            case_dir.mkdir(exist_ok=True)
+            suffix = "" if statement_type == 'ALL' else f"_{statement_type}"
+            pdf_path = case_dir / f"{BENCHMARK_YEAR}-{BENCHMARK_MONTH:02d}_{BENCHMARK_LOCATION}{suffix}.pdf"
+            truth = generate_statement_pdf(pdf_path, statement_type, page_count, style, seed)
+
+            case = {
+                'statement_type': statement_type,
+                'pages': page_count,
+                'format': style,
+                'bytes': pdf_path.stat().st_size,
+                'modes': {},
+            }
+            for mode in modes:
+                case['modes'][mode] = benchmark_file(pdf_path, truth, mode, repeat, tmp_dir)
+                timing = case['modes'][mode]
+                print(f"{name:<10} {mode:<9} {timing['tier'] or '-':<9} {timing['seconds']:>8.3f}s  "
+                      + "  ".join(f"{stage} {timing['stages'][stage]:.3f}" for stage in PARSE_STAGES)
+                      + f"  accuracy {timing['items_correct']}/{timing['items_expected']}")
+            results['cases'][name] = case
+
+    return results
+
+
+def compare_results(old, new, threshold=0.25):
+    """
+    Print time and accuracy changes between two benchmark runs
+    Returns: list of regression descriptions (slower than threshold or less accurate)
+    """
+    regressions = []
+    print(f"\nComparing {old.get('commit') or old['created_at']} -> {new.get('commit') or new['created_at']}")
+    for name, case in new['cases'].items():
+        for mode, timing in case['modes'].items():
+            before = old['cases'].get(name, {}).get('modes', {}).get(mode)
+            if not before:
+                continue
+            change = (timing['seconds'] - before['seconds']) / before['seconds'] if before['seconds'] else 0.0
+            print(f"  {name:<10} {mode:<9} {before['seconds']:>8.3f}s -> {timing['seconds']:>8.3f}s ({change:+.0%})  "
+                  f"accuracy {before['accuracy']:.1%} -> {timing['accuracy']:.1%}")
+            if change > threshold:
+                regressions.append(f"{name} {mode}: {change:+.0%} slower")
+            if timing['accuracy'] < before['accuracy']:
+                regressions.append(f"{name} {mode}: accuracy {before['accuracy']:.1%} -> {timing['accuracy']:.1%}")
+    return regressions
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the PDF parser on generated statements")
+    parser.add_argument('--repeat', type=int, default=3, help="Parses per file and mode (median is reported)")
+    parser.add_argument('--mode', action='append', choices=list(BENCHMARK_MODES), help="Parser mode to run (default: all)")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="Results JSON file")
+    parser.add_argument('--compare', type=Path, help="Earlier results JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Slowdown that counts as a regression (0.25 = 25%%)")
+    parser.add_argument('--keep-pdfs', type=Path, help="Directory to keep the generated PDFs in")
+    args = parser.parse_args()
+
+    regressions = check_text_amounts() + check_split_file_loads()
+    results = run_benchmarks(args.repeat, args.mode, args.keep_pdfs)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    regressions += tier_regressions(results)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions += compare_results(json.load(f), results, args.threshold)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  ✗ {regression}")
+        sys.exit(1)
+    print("\n✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
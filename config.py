@@ -10,10 +10,16 @@ BASE_DIR = Path(__file__).resolve().parent
 FINANCIALS_DIR = BASE_DIR / "financials"
 DATABASE_PATH = BASE_DIR / "masons_financials.duckdb"
 LOGS_DIR = BASE_DIR / "logs"
+CACHE_DIR = BASE_DIR / "cache"
+ARCHIVE_DIR = BASE_DIR / "archive"
+SNAPSHOT_DIR = BASE_DIR / "snapshots"
 
 # Create directories if they don't exist
 FINANCIALS_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
+CACHE_DIR.mkdir(exist_ok=True)
+ARCHIVE_DIR.mkdir(exist_ok=True)
+SNAPSHOT_DIR.mkdir(exist_ok=True)
 
 # Location mapping (updated to match current store list)
 LOCATIONS = {
@@ -127,6 +133,30 @@ CASH_FLOW_ITEMS = [
     "Ending Cash",
 ]
 
+# Page header phrases that start each statement in a combined (_ALL) PDF
+# Keys are the statement type codes used in file names
+# (matched case-insensitively as substrings of a page's first lines)
+STATEMENT_SECTION_HEADERS = {
+    "IS": [
+        "income statement", "statement of income", "statements of income",
+        "profit and loss", "profit & loss", "p&l",
+        "statement of operations", "statements of operations",
+        "statement of earnings", "statements of earnings",
+        "revenues and expenses", "revenue and expenses",
+    ],
+    "BS": ["balance sheet", "statement of financial position", "statements of financial position"],
+    "CF": ["cash flow"],
+}
+
+# Line items that must be found for a statement to count as parsed
+# If the fast text-only pass misses any of these, the parser falls back to
+# full table extraction
+REQUIRED_LINE_ITEMS = {
+    "IS": ["Total Revenue", "Net Income"],
+    "BS": ["Total Assets", "Total Liabilities"],
+    "CF": ["Net Change in Cash"],
+}
+
 # Authentication (use environment variables in production)
 DEFAULT_USERS = {
     "admin": os.getenv("ADMIN_PASSWORD", "changeme123"),  # Change this!
@@ -137,3 +167,30 @@ DEFAULT_USERS = {
 # Dashboard settings
 DASHBOARD_TITLE = "Mason's Famous Lobsters P&L"
 DASHBOARD_PORT = int(os.getenv("PORT", 5000))
+
+# Concurrent dashboard queries: Panel callback threads per process and the
+# number of DuckDB cursors they share
+DASHBOARD_THREADS = int(os.getenv("DASHBOARD_THREADS", 4))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 4))
+
+# In-memory cache of dashboard query results per process (0 disables it)
+QUERY_CACHE_MAX_MB = int(os.getenv("QUERY_CACHE_MAX_MB", 64))
+
+# Read-only database snapshots published by ingestion for the dashboard;
+# the pointer file names the current one
+SNAPSHOT_POINTER = "current.json"
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", 3))
+
+# Parse cache settings (parsed PDFs are cached by file content)
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", 256))
+
+# PDF parsing worker limits (files over a limit are quarantined and skipped)
+PARSE_TIMEOUT_SECONDS = int(os.getenv("PARSE_TIMEOUT_SECONDS", 300))
+PARSE_MAX_RSS_MB = int(os.getenv("PARSE_MAX_RSS_MB", 2048))
+QUARANTINE_FILE = LOGS_DIR / "quarantine.json"
+
+# Per-file ingestion stage timings (JSON lines; summarize with timing_log.py)
+INGEST_TIMING_LOG = LOGS_DIR / "ingest_timings.jsonl"
+
+# Files parsed at once by the automated processor
+AUTO_PROCESS_JOBS = int(os.getenv("AUTO_PROCESS_JOBS", 2))
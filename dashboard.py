@@ -7,12 +7,13 @@ import panel as pn
 import pandas as pd
 import hvplot.pandas
 from datetime import datetime
-from database import FinancialDatabase
+from database import shared_database
 from auth import SimpleAuth
-from config import DASHBOARD_TITLE, DASHBOARD_PORT, LOCATIONS
+from config import DASHBOARD_TITLE, DASHBOARD_PORT, DASHBOARD_THREADS, LOCATIONS, PNL_LINE_ITEMS
 
-# Enable Panel extensions
-pn.extension('tabulator', sizing_mode="stretch_width")
+# Enable Panel extensions; callbacks run on a thread pool so sessions
+# do not wait on each other's queries
+pn.extension('tabulator', sizing_mode="stretch_width", nthreads=DASHBOARD_THREADS)
 
 # Industry Benchmarks for Restaurant Business
 BENCHMARKS = {
@@ -25,8 +26,8 @@ BENCHMARKS = {
     'opex_ratio_pct': 25.0,  # Ideal: 20-30%
 }
 
-# Initialize
-db = FinancialDatabase()
+# Initialize (read-only database shared by all sessions in this process)
+db = shared_database()
 auth = SimpleAuth()
 
 
@@ -180,37 +181,34 @@ class PLDashboard:
                 return f"Location: {LOCATIONS[loc]['name']}"
 
     def get_filtered_data(self):
-        """Get data based on current filters"""
+        """Get data based on current filters (filtered in the database query)"""
+        start_date, end_date = self.date_range.value
+        bounds = {'start': pd.Timestamp(start_date), 'end': pd.Timestamp(end_date)}
+
         if self.view_selector.value == 'Consolidated':
-            df = db.get_consolidated_data()
+            df = db.get_consolidated_data(**bounds)
         elif self.view_selector.value == 'By Region':
             region = self.region_selector.value
             if region == 'All':
-                df = db.get_all_data()
+                df = db.get_all_data(**bounds)
             else:
-                df = db.get_data_by_region(region)
+                df = db.get_data_by_region(region, **bounds)
         else:  # By Location
             loc = self.location_selector.value
             if loc == 'All':
-                df = db.get_all_data()
+                df = db.get_all_data(**bounds)
             else:
-                df = db.get_data_by_location(loc)
-
-        # Filter by date range if data exists
-        if not df.empty and 'period_date' in df.columns:
-            start_date, end_date = self.date_range.value
-            df = df[(df['period_date'] >= pd.Timestamp(start_date)) &
-                   (df['period_date'] <= pd.Timestamp(end_date))]
+                df = db.get_data_by_location(loc, **bounds)
 
         return df
 
     def calculate_kpis(self, df):
         """Calculate key performance indicators"""
-        if df.empty or 'line_item' not in df.columns:
+        if df.empty or 'Total Revenue' not in df.columns:
             return {}
 
-        # Aggregate by line item
-        totals = df.groupby('line_item')['amount'].sum()
+        # Total each line item column
+        totals = df[[item for item in PNL_LINE_ITEMS if item in df.columns]].sum()
 
         # Get key values
         revenue = totals.get('Total Revenue', 0)
@@ -398,15 +396,15 @@ class PLDashboard:
 
         try:
             # Revenue over time - Enhanced
-            if 'period_date' in df.columns and 'amount' in df.columns:
-                revenue_df = df[df['line_item'] == 'Total Revenue'].copy()
+            if 'period_date' in df.columns and 'Total Revenue' in df.columns:
+                revenue_df = df[df['Total Revenue'].notna()]
                 if not revenue_df.empty and len(revenue_df) > 1:
-                    revenue_df = revenue_df.groupby('period_date')['amount'].sum().reset_index()
+                    revenue_df = revenue_df.groupby('period_date')['Total Revenue'].sum().reset_index()
                     revenue_df = revenue_df.sort_values('period_date')
 
                     chart = revenue_df.hvplot.line(
                         x='period_date',
-                        y='amount',
+                        y='Total Revenue',
                         title='Revenue Over Time',
                         xlabel='Period',
                         ylabel='Revenue ($)',
@@ -422,16 +420,16 @@ class PLDashboard:
                     charts.append(pn.pane.HoloViews(chart, sizing_mode='stretch_width'))
 
             # Net Income over time - Enhanced
-            if 'period_date' in df.columns and 'amount' in df.columns:
-                ni_df = df[df['line_item'] == 'Net Income'].copy()
+            if 'period_date' in df.columns and 'Net Income' in df.columns:
+                ni_df = df[df['Net Income'].notna()]
                 if not ni_df.empty and len(ni_df) > 1:
-                    ni_df = ni_df.groupby('period_date')['amount'].sum().reset_index()
+                    ni_df = ni_df.groupby('period_date')['Net Income'].sum().reset_index()
                     ni_df = ni_df.sort_values('period_date')
 
                     # Color based on positive/negative
                     chart = ni_df.hvplot.line(
                         x='period_date',
-                        y='amount',
+                        y='Net Income',
                         title='Net Income Over Time',
                         xlabel='Period',
                         ylabel='Net Income ($)',
@@ -482,15 +480,14 @@ class PLDashboard:
                         charts.append(pn.pane.HoloViews(margin_chart, sizing_mode='stretch_width'))
 
             # P&L breakdown (all periods combined)
-            if 'line_item' in df.columns and 'amount' in df.columns:
-                pnl_df = df.groupby('line_item')['amount'].sum().reset_index()
+            # Filter to key line items for cleaner visualization
+            key_items = ['Total Revenue', 'Cost of Goods Sold', 'Gross Profit', 'Labor',
+                        'Total Operating Expenses', 'EBITDA', 'Net Income']
+            key_items = [item for item in key_items if item in df.columns]
+            if key_items:
+                pnl_df = df[key_items].sum().rename_axis('line_item').reset_index(name='amount')
                 pnl_df = pnl_df[pnl_df['amount'] != 0]  # Remove zero values
 
-                # Filter to key line items for cleaner visualization
-                key_items = ['Total Revenue', 'Cost of Goods Sold', 'Gross Profit', 'Labor',
-                            'Total Operating Expenses', 'EBITDA', 'Net Income']
-                pnl_df = pnl_df[pnl_df['line_item'].isin(key_items)]
-
                 if not pnl_df.empty:
                     chart = pnl_df.hvplot.bar(
                         x='line_item',
@@ -530,8 +527,8 @@ class PLDashboard:
         display_df = df.copy()
 
         # Format amounts
-        if 'amount' in display_df.columns:
-            display_df['amount'] = display_df['amount'].apply(
+        for column in [item for item in PNL_LINE_ITEMS if item in display_df.columns]:
+            display_df[column] = display_df[column].apply(
                 lambda x: f"${x:,.2f}" if pd.notna(x) else ""
             )
 
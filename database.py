@@ -2,25 +2,199 @@
 Database management for financial statements
 """
 
+import os
+import json
+import shutil
 import duckdb
+import threading
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime
-from config import DATABASE_PATH, LOCATIONS, PNL_LINE_ITEMS
+from query_cache import QueryCache
+from config import (DATABASE_PATH, LOCATIONS, PNL_LINE_ITEMS, DB_POOL_SIZE, QUERY_CACHE_MAX_MB,
+                    SNAPSHOT_DIR, SNAPSHOT_POINTER, SNAPSHOT_KEEP)
+
+# Tables whose rows get sequence-generated IDs
+STATEMENT_TABLES = ['financial_statements', 'pnl_data', 'balance_sheet_data', 'cash_flow_data']
+
+# Line item tables (parse results use the same names for their data)
+LINE_ITEM_TABLES = ['pnl_data', 'balance_sheet_data', 'cash_flow_data']
+
+# Every file a statement was loaded from: the file of each of its line item
+# tables (separate IS/BS/CF files), plus the statement's latest file
+STATEMENT_FILES = """
+    SELECT statement_id, file_name, file_hash FROM statement_files
+    UNION
+    SELECT id, file_name, file_hash FROM financial_statements
+"""
+
+
+def quote_identifier(name):
+    """Quote a line item name for use as a column name"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    """Quote a line item name for use as a string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+# Wide P&L column sums, one per standard line item
+PNL_SUMS = ", ".join(f"SUM(w.{quote_identifier(item)}) AS {quote_identifier(item)}" for item in PNL_LINE_ITEMS)
+
+
+def pnl_columns(line_items=None):
+    """
+    Wide P&L columns (of table alias w) to select
+    line_items: subset of PNL_LINE_ITEMS to return (None for all); names
+    that are not standard line items are ignored
+    Returns: list of column expressions
+    """
+    if line_items is None:
+        line_items = PNL_LINE_ITEMS
+    return [f"w.{quote_identifier(item)}" for item in PNL_LINE_ITEMS if item in line_items]
+
+
+def pnl_filters(start=None, end=None, regions=None, locations=None):
+    """
+    WHERE conditions for the dashboard query filters, on table aliases w
+    (wide P&L rows) and l (locations)
+    start, end: first and last period date to include (None for open-ended)
+    regions, locations: lists of region names / location codes to include
+    (None for all)
+    Returns: (list of SQL conditions, list of parameters)
+    """
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("w.period_date >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("w.period_date <= ?")
+        params.append(end)
+    if regions is not None:
+        conditions.append("l.region IN (SELECT UNNEST(?::VARCHAR[]))")
+        params.append(list(regions))
+    if locations is not None:
+        conditions.append("w.location_code IN (SELECT UNNEST(?::VARCHAR[]))")
+        params.append(list(locations))
+    return conditions, params
+
+
+def arrow_result(table):
+    """
+    Prepare a fetched query result for caching: string columns are
+    dictionary-encoded (categoricals in pandas), and DECIMAL amounts and
+    dates get the float64 and datetime64[us] types .df() gives them
+    Returns: pyarrow Table
+    """
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            column = pc.dictionary_encode(column)
+        elif pa.types.is_decimal(field.type):
+            column = column.cast(pa.float64())
+        elif pa.types.is_date(field.type):
+            column = column.cast(pa.timestamp('us'))
+        else:
+            continue
+        table = table.set_column(i, field.name, column)
+    return table
+
+
+# Pre-aggregated P&L rollups of pnl_monthly and the columns they group by
+# (besides year and month)
+PNL_ROLLUPS = {
+    'pnl_region_monthly': ['region'],
+    'pnl_consolidated_monthly': [],
+}
+
+# Wide P&L tables: one DECIMAL column per line item in PNL_LINE_ITEMS
+WIDE_PNL_TABLES = ['pnl_monthly'] + list(PNL_ROLLUPS)
 
 
 class FinancialDatabase:
     """Manages the DuckDB database for financial statements"""
 
-    def __init__(self, db_path=DATABASE_PATH):
+    def __init__(self, db_path=DATABASE_PATH, read_only=False, pool_size=DB_POOL_SIZE,
+                 cache_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024):
         self.db_path = db_path
         self.conn = None
-        self.initialize_database()
+        self.in_transaction = False
+        self.read_only = read_only
+        self.query_cache = QueryCache(cache_bytes) if cache_bytes else None
+
+        # Cursors handed out to query callers (at most pool_size at once)
+        self.pool_slots = threading.BoundedSemaphore(pool_size)
+        self.pool_lock = threading.Lock()
+        self.idle_cursors = []
+
+        if read_only:
+            self.open_read_only()
+        else:
+            self.initialize_database()
+
+    def open_read_only(self):
+        """
+        Open the database read-only (for the dashboard, on a published
+        snapshot whose schema the ingest process keeps up to date)
+        """
+        self.conn = duckdb.connect(str(self.db_path), read_only=True)
+
+    @contextmanager
+    def cursor(self):
+        """
+        Borrow a cursor from the pool for one query
+        Each cursor is its own DuckDB connection to the shared database, so
+        threads can query at the same time. Callers wait while pool_size
+        cursors are in use.
+        """
+        with self.pool_slots:
+            with self.pool_lock:
+                cursor = self.idle_cursors.pop() if self.idle_cursors else self.conn.cursor()
+            try:
+                yield cursor
+            finally:
+                with self.pool_lock:
+                    self.idle_cursors.append(cursor)
+
+    def cached_query(self, query, params=(), arrow=False):
+        """
+        Run a read query through the query result cache
+        Results are fetched and cached as Arrow tables; string columns come
+        back to pandas as categoricals. The data version is read before the
+        query, so a result that raced with a load is dropped at the next
+        call rather than served stale
+        Returns: DataFrame (pyarrow Table with arrow=True)
+        """
+        with self.cursor() as cursor:
+            if self.query_cache is None:
+                table = arrow_result(cursor.execute(query, params).fetch_arrow_table())
+                return table if arrow else table.to_pandas()
+
+            version = cursor.execute("SELECT version FROM data_version").fetchall()[0][0]
+            key = repr((query, params))
+            result = self.query_cache.get(key, version, arrow)
+            if result is not None:
+                return result
+            table = arrow_result(cursor.execute(query, params).fetch_arrow_table())
+            if arrow:
+                self.query_cache.put(key, version, table)
+                return table
+            df = table.to_pandas()
+            self.query_cache.put(key, version, table, df)
+            return df
 
     def initialize_database(self):
         """Create tables if they don't exist"""
         self.conn = duckdb.connect(str(self.db_path))
 
+        # ID sequences (DuckDB INTEGER PRIMARY KEY does not auto-increment)
+        for table in STATEMENT_TABLES:
+            self.conn.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq START 1")
+
         # Locations table
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS locations (
@@ -35,12 +209,13 @@ class FinancialDatabase:
         # Financial statements table
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS financial_statements (
-                id INTEGER PRIMARY KEY,
+                id INTEGER PRIMARY KEY DEFAULT nextval('financial_statements_id_seq'),
                 location_code VARCHAR NOT NULL,
                 year INTEGER NOT NULL,
                 month INTEGER NOT NULL,
                 period_date DATE NOT NULL,
                 file_name VARCHAR NOT NULL,
+                file_hash VARCHAR,
                 upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 processed BOOLEAN DEFAULT FALSE,
                 FOREIGN KEY (location_code) REFERENCES locations(location_code),
@@ -51,7 +226,7 @@ class FinancialDatabase:
         # P&L line items table (Income Statement)
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS pnl_data (
-                id INTEGER PRIMARY KEY,
+                id INTEGER PRIMARY KEY DEFAULT nextval('pnl_data_id_seq'),
                 statement_id INTEGER NOT NULL,
                 line_item VARCHAR NOT NULL,
                 amount DECIMAL(15, 2),
@@ -63,7 +238,7 @@ class FinancialDatabase:
         # Balance Sheet data table
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS balance_sheet_data (
-                id INTEGER PRIMARY KEY,
+                id INTEGER PRIMARY KEY DEFAULT nextval('balance_sheet_data_id_seq'),
                 statement_id INTEGER NOT NULL,
                 line_item VARCHAR NOT NULL,
                 amount DECIMAL(15, 2),
@@ -76,7 +251,7 @@ class FinancialDatabase:
         # Cash Flow data table
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS cash_flow_data (
-                id INTEGER PRIMARY KEY,
+                id INTEGER PRIMARY KEY DEFAULT nextval('cash_flow_data_id_seq'),
                 statement_id INTEGER NOT NULL,
                 line_item VARCHAR NOT NULL,
                 amount DECIMAL(15, 2),
@@ -86,11 +261,108 @@ class FinancialDatabase:
             )
         """)
 
+        # File each statement's line item tables were loaded from; a month
+        # sent as separate IS/BS/CF files has a different file per table
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS statement_files (
+                statement_id INTEGER NOT NULL,
+                table_name VARCHAR NOT NULL,
+                file_name VARCHAR NOT NULL,
+                file_hash VARCHAR,
+                PRIMARY KEY (statement_id, table_name)
+            )
+        """)
+
+        # Wide P&L fact table: one row per processed statement with one
+        # column per line item (added by _migrate_schema), kept in step with
+        # pnl_data on every load so dashboard queries need no pivot
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pnl_monthly (
+                statement_id INTEGER PRIMARY KEY,
+                location_code VARCHAR NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                period_date DATE NOT NULL
+            )
+        """)
+
+        # Region and consolidated rollups of pnl_monthly, refreshed for the
+        # periods each load touches
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pnl_region_monthly (
+                region VARCHAR NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                period_date DATE NOT NULL,
+                location_count INTEGER NOT NULL,
+                PRIMARY KEY (region, year, month)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pnl_consolidated_monthly (
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                period_date DATE NOT NULL,
+                location_count INTEGER NOT NULL,
+                PRIMARY KEY (year, month)
+            )
+        """)
+
+        # Counter bumped by every load that changes the data; query caches
+        # compare it to know when their results are stale
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+        """)
+        self.conn.execute("INSERT INTO data_version VALUES (1, 0) ON CONFLICT DO NOTHING")
+
+        # Bring databases created before the ID sequences up to date
+        self._migrate_schema()
+
         # Populate locations
         self._populate_locations()
 
+    def _migrate_schema(self):
+        """Apply schema changes to tables created by older versions"""
+        for table in STATEMENT_TABLES:
+            self.conn.execute(f"""
+                ALTER TABLE {table}
+                ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')
+            """)
+        # SHA-256 of the file each statement was loaded from
+        self.conn.execute("ALTER TABLE financial_statements ADD COLUMN IF NOT EXISTS file_hash VARCHAR")
+
+        # Statements loaded before statement_files kept their tables' files
+        # got all of them from the statement's file
+        if not self.conn.execute("SELECT count(*) FROM statement_files").fetchall()[0][0]:
+            for table in LINE_ITEM_TABLES:
+                self.conn.execute(f"""
+                    INSERT INTO statement_files (statement_id, table_name, file_name, file_hash)
+                    SELECT s.id, '{table}', s.file_name, s.file_hash
+                    FROM financial_statements s
+                    WHERE EXISTS (SELECT 1 FROM {table} d WHERE d.statement_id = s.id)
+                """)
+
+        # A column for each P&L line item; new tables or new line items
+        # mean the wide tables have to be rebuilt from pnl_data
+        rebuild = False
+        for table in WIDE_PNL_TABLES:
+            columns = {row[0] for row in self.conn.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = ?
+            """, [table]).fetchall()}
+            missing = [item for item in PNL_LINE_ITEMS if item not in columns]
+            for item in missing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {quote_identifier(item)} DECIMAL(15, 2)")
+            rebuild = rebuild or bool(missing)
+        if rebuild:
+            self.refresh_pnl_monthly()
+
     def _populate_locations(self):
         """Insert or update location data"""
+        regions = dict(self.conn.execute("SELECT location_code, region FROM locations").fetchall())
         for code, info in LOCATIONS.items():
             self.conn.execute("""
                 INSERT INTO locations (location_code, location_name, city, status, region)
@@ -103,17 +375,59 @@ class FinancialDatabase:
                     region = EXCLUDED.region
             """, [code, info["name"], info["city"], info["status"], info["region"]])
 
-    def add_financial_statement(self, location_code, year, month, file_name):
+        # A location moved to another region changes the region rollups
+        if any(code in regions and regions[code] != info["region"] for code, info in LOCATIONS.items()):
+            self.refresh_pnl_rollups()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of writes as one transaction
+        Rolls back and re-raises if anything in the block fails. A nested
+        transaction joins the outer one.
+        """
+        if self.in_transaction:
+            yield
+            return
+
+        self.conn.execute("BEGIN TRANSACTION")
+        self.in_transaction = True
+        try:
+            yield
+            # The add_* methods print their errors, and DuckDB turns COMMIT
+            # of an aborted transaction into a silent rollback, so make sure
+            # the transaction is still good before committing
+            self.conn.execute("SELECT 1")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.in_transaction = False
+
+    def get_statement_files(self, location_code, year, month):
+        """
+        Look up the files a location and period's statement was loaded from
+        Returns: set of file names (empty if the period is not loaded)
+        """
+        return {row[0] for row in self.conn.execute(f"""
+            SELECT f.file_name
+            FROM financial_statements s
+            JOIN ({STATEMENT_FILES}) f ON f.statement_id = s.id
+            WHERE s.location_code = ? AND s.year = ? AND s.month = ?
+        """, [location_code, year, month]).fetchall()}
+
+    def add_financial_statement(self, location_code, year, month, file_name, file_hash=None):
         """Add a new financial statement record"""
         period_date = datetime(year, month, 1).date()
 
         try:
             result = self.conn.execute("""
                 INSERT INTO financial_statements
-                (location_code, year, month, period_date, file_name, processed)
-                VALUES (?, ?, ?, ?, ?, FALSE)
+                (location_code, year, month, period_date, file_name, file_hash, processed)
+                VALUES (?, ?, ?, ?, ?, ?, FALSE)
                 RETURNING id
-            """, [location_code, year, month, period_date, file_name])
+            """, [location_code, year, month, period_date, file_name, file_hash])
 
             statement_id = result.fetchone()[0]
             return statement_id
@@ -157,6 +471,544 @@ class FinancialDatabase:
         except Exception as e:
             print(f"Error adding Cash Flow data: {e}")
 
+    def add_statement_data(self, location_code, year, month, file_name, statements, file_hash=None):
+        """
+        Add or restate a statement with all of its line items in one transaction
+        statements: dict of {table: {line_item: amount}} for LINE_ITEM_TABLES
+        (a parse result can be passed as is). The line items are registered
+        as one DataFrame and each table is written with a single INSERT,
+        then the statement is marked processed.
+        Each line item table the file has line items for is recorded as
+        loaded from it, so a month can be sent as separate IS/BS/CF files
+        (a file with a table the month does not have yet counts as added).
+        A statement whose tables were already loaded from a file with the
+        same hash is left as it is. Otherwise it is restated: only line items
+        whose amounts differ are upserted, and line items the new file no
+        longer lists are deleted (in the tables it has line items for).
+        Returns: (statement id, 'added', 'unchanged' or 'restated', line
+        items written or deleted) or None if failed
+        """
+        rows = [
+            (table, location_code, year, month, line_item, amount)
+            for table in LINE_ITEM_TABLES
+            for line_item, amount in (statements.get(table) or {}).items()
+        ]
+        batch = pd.DataFrame(rows, columns=['table_name', 'location_code', 'year', 'month', 'line_item', 'amount'])
+        tables = sorted(set(batch['table_name']))
+
+        try:
+            with self.transaction():
+                existing = self.conn.execute("""
+                    SELECT id, file_hash, processed FROM financial_statements
+                    WHERE location_code = ? AND year = ? AND month = ?
+                """, [location_code, year, month]).fetchall()
+                existing = existing[0] if existing else None
+                loaded = dict(self.conn.execute("""
+                    SELECT table_name, file_hash FROM statement_files WHERE statement_id = ?
+                """, [existing[0]]).fetchall()) if existing else {}
+                if existing and file_hash is not None:
+                    if all(loaded.get(table) == file_hash for table in tables) and (tables or existing[1] == file_hash):
+                        return existing[0], 'unchanged', 0
+
+                self.conn.register('statement_batch', batch)
+                try:
+                    if existing:
+                        statement_id = existing[0]
+                        self.conn.execute("""
+                            UPDATE financial_statements
+                            SET file_name = ?, file_hash = ?, upload_date = CURRENT_TIMESTAMP
+                            WHERE id = ?
+                        """, [file_name, file_hash, statement_id])
+                        counts = self._upsert_changed_rows('statement_batch')
+                        deleted = self._delete_missing_rows('statement_batch')
+                        # Another statement type of the month is an addition
+                        status = 'restated' if not tables or any(table in loaded for table in tables) else 'added'
+                        written = sum(inserted + updated for inserted, updated in counts.values()) + sum(deleted.values())
+                    else:
+                        statement_id = self.add_financial_statement(location_code, year, month, file_name, file_hash)
+                        if statement_id is None:
+                            raise RuntimeError(f"Could not add statement for {location_code} {year}-{month:02d}")
+                        for table in LINE_ITEM_TABLES:
+                            self.conn.execute(f"""
+                                INSERT INTO {table} (statement_id, line_item, amount)
+                                SELECT ?, line_item, CAST(amount AS DECIMAL(15, 2))
+                                FROM statement_batch
+                                WHERE table_name = '{table}'
+                            """, [statement_id])
+                        status = 'added'
+                        written = len(batch)
+                    self.conn.execute("""
+                        INSERT INTO statement_files (statement_id, table_name, file_name, file_hash)
+                        SELECT DISTINCT ?, table_name, ?, ? FROM statement_batch
+                        ON CONFLICT (statement_id, table_name)
+                        DO UPDATE SET file_name = EXCLUDED.file_name, file_hash = EXCLUDED.file_hash
+                    """, [statement_id, file_name, file_hash])
+                finally:
+                    self.conn.unregister('statement_batch')
+
+                self.mark_statement_processed(statement_id)
+                # A restate that changed nothing leaves the data version alone
+                if status == 'added' or written or not existing[2]:
+                    self.refresh_pnl_monthly([statement_id])
+            return statement_id, status, written
+        except Exception as e:
+            print(f"Error adding statement data: {e}")
+            return None
+
+    def upsert_changed_amounts(self, amounts):
+        """
+        Bulk upsert re-matched line item amounts that differ from what is loaded
+        amounts: DataFrame with table_name, location_code, year, month,
+        line_item, amount, file_name, file_hash, own_period and order (one
+        row per source file, statement and line item)
+        A row only applies to a statement table loaded from its file: a
+        file's own period when the table was loaded from the same file hash
+        (by file name for statements loaded before hashes were kept, or any
+        of the month's files for a table without line items yet), and month
+        columns when every table of the month was loaded from the same file
+        name. Manual CSV entries and tables loaded from another file (such
+        as the other files of a month sent as separate IS/BS/CF files) are
+        left as they are. Each table takes one file's rows: own periods win,
+        then the highest order. Rows for statements that are not in the
+        database are ignored.
+        Returns: dict of {table: (inserted, updated)}
+        """
+        self.conn.register('archived_amounts', amounts)
+        try:
+            with self.transaction():
+                self.conn.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE matched_amounts AS
+                    SELECT m.table_name, m.location_code, m.year, m.month, m.line_item, m.amount,
+                        m.file_name, m.file_hash
+                    FROM archived_amounts m
+                    JOIN financial_statements s
+                        ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                    LEFT JOIN statement_files f ON f.statement_id = s.id AND f.table_name = m.table_name
+                    WHERE CASE
+                        WHEN NOT m.own_period THEN NOT EXISTS (
+                            SELECT 1 FROM ({STATEMENT_FILES}) x
+                            WHERE x.statement_id = s.id AND x.file_name IS DISTINCT FROM m.file_name
+                        )
+                        WHEN f.statement_id IS NOT NULL THEN coalesce(f.file_hash = m.file_hash, f.file_name = m.file_name)
+                        ELSE EXISTS (
+                            SELECT 1 FROM ({STATEMENT_FILES}) x
+                            WHERE x.statement_id = s.id AND coalesce(x.file_hash = m.file_hash, x.file_name = m.file_name)
+                        )
+                    END
+                    QUALIFY dense_rank() OVER (
+                        PARTITION BY m.table_name, m.location_code, m.year, m.month
+                        ORDER BY m.own_period DESC, m."order" DESC, m.file_hash DESC
+                    ) = 1
+                """)
+                counts = self._upsert_changed_rows('matched_amounts')
+                if any(inserted or updated for inserted, updated in counts.values()):
+                    self._record_statement_files('matched_amounts', replace=False)
+                    self.refresh_pnl_monthly(self._statement_ids('matched_amounts'))
+                return counts
+        finally:
+            self.conn.unregister('archived_amounts')
+            self.conn.execute("DROP TABLE IF EXISTS matched_amounts")
+
+    def _upsert_changed_rows(self, source):
+        """
+        Set-based upsert of line item amounts from a table or view with
+        table_name, location_code, year, month, line_item and amount
+        Only rows whose amount differs from the loaded one are written
+        Returns: dict of {table: (inserted, updated)}
+        """
+        counts = {}
+        for table in LINE_ITEM_TABLES:
+            changed = f"""
+                SELECT
+                    s.id AS statement_id,
+                    m.line_item,
+                    CAST(m.amount AS DECIMAL(15, 2)) AS amount,
+                    d.id IS NULL AS is_new
+                FROM {source} m
+                JOIN financial_statements s
+                    ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                LEFT JOIN {table} d
+                    ON d.statement_id = s.id AND d.line_item = m.line_item
+                WHERE m.table_name = '{table}'
+                  AND d.amount IS DISTINCT FROM CAST(m.amount AS DECIMAL(15, 2))
+            """
+            inserted, updated = self.conn.execute(f"""
+                SELECT count(*) FILTER (WHERE is_new), count(*) FILTER (WHERE NOT is_new)
+                FROM ({changed})
+            """).fetchone()
+            self.conn.execute(f"""
+                INSERT INTO {table} (statement_id, line_item, amount)
+                SELECT statement_id, line_item, amount FROM ({changed})
+                ON CONFLICT (statement_id, line_item)
+                DO UPDATE SET amount = EXCLUDED.amount
+            """)
+            counts[table] = (inserted, updated)
+        return counts
+
+    def _delete_missing_rows(self, source):
+        """
+        Delete line items of the statements in a table or view (with
+        table_name, location_code, year, month and line_item) that it does
+        not list. A statement's table is only touched when the source has
+        line items for it, so a file with one statement type (or a P&L-only
+        manual entry) leaves the other statements of its month alone.
+        Returns: dict of {table: rows deleted}
+        """
+        counts = {}
+        for table in LINE_ITEM_TABLES:
+            counts[table] = self.conn.execute(f"""
+                DELETE FROM {table}
+                WHERE id IN (
+                    SELECT d.id
+                    FROM (
+                        SELECT DISTINCT location_code, year, month FROM {source}
+                        WHERE table_name = '{table}'
+                    ) m
+                    JOIN financial_statements s
+                        ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                    JOIN {table} d ON d.statement_id = s.id
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM {source} n
+                        WHERE n.table_name = '{table}' AND n.location_code = s.location_code
+                          AND n.year = s.year AND n.month = s.month AND n.line_item = d.line_item
+                    )
+                )
+            """).fetchone()[0]
+        return counts
+
+    def bulk_load(self, statements, amounts):
+        """
+        Load a whole backfill through staging tables in one transaction
+        statements: DataFrame with location_code, year, month, file_name,
+        file_hash, own_period (False for months taken from another file's
+        month columns) and order (one row per file and month)
+        amounts: DataFrame with table_name, location_code, year, month,
+        line_item, amount, file_name, file_hash, own_period and order (one
+        row per file, month and line item)
+        Both are copied into temporary staging tables, then each target
+        table gets one set-based INSERT ... ON CONFLICT. Each table of a
+        month is loaded from one file, as add_statement_data would:
+        - a month's own files beat month columns, and month columns never
+          replace a month loaded from another file
+        - of several files for the same table, the highest order wins, so
+          separate IS/BS/CF files each load their own table
+        - tables already loaded from a file with the same hash are skipped
+        Restated tables lose the line items their new file no longer lists.
+        Returns: dict of {table: (inserted, updated)} for financial_statements
+        and the line item tables, plus 'unchanged': files skipped and
+        'deleted': line items removed from restated statements
+        """
+        self.conn.register('statements_batch', statements)
+        self.conn.register('amounts_batch', amounts)
+        try:
+            with self.transaction():
+                self.conn.execute("""
+                    CREATE OR REPLACE TEMP TABLE staging_statements AS
+                    SELECT
+                        CAST(location_code AS VARCHAR) AS location_code,
+                        CAST(year AS INTEGER) AS year,
+                        CAST(month AS INTEGER) AS month,
+                        CAST(file_name AS VARCHAR) AS file_name,
+                        CAST(file_hash AS VARCHAR) AS file_hash,
+                        CAST(own_period AS BOOLEAN) AS own_period,
+                        CAST("order" AS VARCHAR) AS "order"
+                    FROM statements_batch
+                """)
+                self.conn.execute("""
+                    CREATE OR REPLACE TEMP TABLE staging_amounts AS
+                    SELECT
+                        CAST(table_name AS VARCHAR) AS table_name,
+                        CAST(location_code AS VARCHAR) AS location_code,
+                        CAST(year AS INTEGER) AS year,
+                        CAST(month AS INTEGER) AS month,
+                        CAST(line_item AS VARCHAR) AS line_item,
+                        CAST(amount AS DOUBLE) AS amount,
+                        CAST(file_name AS VARCHAR) AS file_name,
+                        CAST(file_hash AS VARCHAR) AS file_hash,
+                        CAST("order" AS VARCHAR) AS "order"
+                    FROM amounts_batch
+                """)
+
+                # Month columns only load months without an own file in the
+                # batch and not loaded from another file, from one file each
+                self.conn.execute(f"""
+                    DELETE FROM staging_statements m
+                    WHERE NOT own_period AND (
+                        EXISTS (
+                            SELECT 1 FROM staging_statements o
+                            WHERE o.location_code = m.location_code AND o.year = m.year AND o.month = m.month
+                              AND (o.own_period OR o."order" > m."order")
+                        )
+                        OR EXISTS (
+                            SELECT 1 FROM financial_statements s
+                            JOIN ({STATEMENT_FILES}) f ON f.statement_id = s.id
+                            WHERE s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                              AND f.file_name IS DISTINCT FROM m.file_name
+                        )
+                    )
+                """)
+                self.conn.execute("""
+                    DELETE FROM staging_amounts a
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM staging_statements m
+                        WHERE m.location_code = a.location_code AND m.year = a.year AND m.month = a.month
+                          AND m.file_name = a.file_name
+                    )
+                """)
+                # Each table of a month comes from one file
+                self.conn.execute("""
+                    DELETE FROM staging_amounts a
+                    WHERE EXISTS (
+                        SELECT 1 FROM staging_amounts o
+                        WHERE o.location_code = a.location_code AND o.year = a.year AND o.month = a.month
+                          AND o.table_name = a.table_name AND o."order" > a."order"
+                    )
+                """)
+
+                # Tables loaded from an identical file need no work, nor do
+                # files left without any
+                self.conn.execute("""
+                    DELETE FROM staging_amounts a
+                    WHERE EXISTS (
+                        SELECT 1 FROM financial_statements s
+                        JOIN statement_files f ON f.statement_id = s.id
+                        WHERE s.location_code = a.location_code AND s.year = a.year AND s.month = a.month
+                          AND s.processed AND f.table_name = a.table_name AND f.file_hash = a.file_hash
+                    )
+                """)
+                unchanged = self.conn.execute(f"""
+                    DELETE FROM staging_statements m
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM staging_amounts a
+                        WHERE a.location_code = m.location_code AND a.year = m.year AND a.month = m.month
+                          AND a.file_name = m.file_name
+                    )
+                    AND EXISTS (
+                        SELECT 1 FROM financial_statements s
+                        JOIN ({STATEMENT_FILES}) f ON f.statement_id = s.id
+                        WHERE s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                          AND s.processed AND f.file_hash = m.file_hash
+                    )
+                """).fetchone()[0]
+
+                # A statement row per month, named after the file that
+                # supplies most of what changed
+                changed = """
+                    SELECT
+                        m.location_code, m.year, m.month,
+                        make_date(m.year, m.month, 1) AS period_date,
+                        m.file_name,
+                        m.file_hash,
+                        s.id IS NULL AS is_new
+                    FROM (
+                        SELECT m.*
+                        FROM staging_statements m
+                        LEFT JOIN (
+                            SELECT location_code, year, month, file_name, count(*) AS line_items
+                            FROM staging_amounts
+                            GROUP BY location_code, year, month, file_name
+                        ) a ON a.location_code = m.location_code AND a.year = m.year AND a.month = m.month
+                           AND a.file_name = m.file_name
+                        QUALIFY row_number() OVER (
+                            PARTITION BY m.location_code, m.year, m.month
+                            ORDER BY coalesce(a.line_items, 0) DESC, m."order" DESC
+                        ) = 1
+                    ) m
+                    LEFT JOIN financial_statements s
+                        ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                    WHERE s.id IS NULL OR s.file_name IS DISTINCT FROM m.file_name
+                       OR s.file_hash IS DISTINCT FROM m.file_hash OR NOT s.processed
+                """
+                inserted, updated = self.conn.execute(f"""
+                    SELECT count(*) FILTER (WHERE is_new), count(*) FILTER (WHERE NOT is_new)
+                    FROM ({changed})
+                """).fetchone()
+                self.conn.execute(f"""
+                    INSERT INTO financial_statements (location_code, year, month, period_date, file_name, file_hash, processed)
+                    SELECT location_code, year, month, period_date, file_name, file_hash, FALSE FROM ({changed})
+                    ON CONFLICT (location_code, year, month)
+                    DO UPDATE SET file_name = EXCLUDED.file_name, file_hash = EXCLUDED.file_hash,
+                        upload_date = EXCLUDED.upload_date
+                """)
+                counts = {'financial_statements': (inserted, updated), 'unchanged': unchanged}
+                counts.update(self._upsert_changed_rows('staging_amounts'))
+                counts['deleted'] = sum(self._delete_missing_rows('staging_amounts').values())
+                self._record_statement_files('staging_amounts')
+
+                # Mark processed once every line item table is written
+                marked = self.conn.execute("""
+                    UPDATE financial_statements s
+                    SET processed = TRUE
+                    FROM staging_statements m
+                    WHERE s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+                      AND NOT s.processed
+                """).fetchone()[0]
+                # Restated files whose amounts all match leave the data version alone
+                if marked or counts['deleted'] or any(
+                    inserted or updated for inserted, updated in (counts[table] for table in LINE_ITEM_TABLES)
+                ):
+                    self.refresh_pnl_monthly(self._statement_ids('staging_statements'))
+            return counts
+        finally:
+            self.conn.unregister('statements_batch')
+            self.conn.unregister('amounts_batch')
+            self.conn.execute("DROP TABLE IF EXISTS staging_statements")
+            self.conn.execute("DROP TABLE IF EXISTS staging_amounts")
+
+    def _record_statement_files(self, source, replace=True):
+        """
+        Record the file each statement table in a table or view (with
+        table_name, location_code, year, month, file_name and file_hash) was
+        loaded from; the source must name one file per statement and table
+        replace: False to keep the files already recorded
+        """
+        action = ("DO UPDATE SET file_name = EXCLUDED.file_name, file_hash = EXCLUDED.file_hash"
+                  if replace else "DO NOTHING")
+        self.conn.execute(f"""
+            INSERT INTO statement_files (statement_id, table_name, file_name, file_hash)
+            SELECT DISTINCT s.id, m.table_name, m.file_name, m.file_hash
+            FROM {source} m
+            JOIN financial_statements s
+                ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+            ON CONFLICT (statement_id, table_name) {action}
+        """)
+
+    def _statement_ids(self, source):
+        """
+        IDs of the statements for the location and periods in a table or view
+        Returns: list of statement ids
+        """
+        return [row[0] for row in self.conn.execute(f"""
+            SELECT DISTINCT s.id
+            FROM (SELECT DISTINCT location_code, year, month FROM {source}) m
+            JOIN financial_statements s
+                ON s.location_code = m.location_code AND s.year = m.year AND s.month = m.month
+        """).fetchall()]
+
+    def refresh_pnl_monthly(self, statement_ids=None):
+        """
+        Rebuild the wide P&L rows of the given statements from pnl_data
+        (every statement if statement_ids is None)
+        Only processed statements with P&L data get a row, and line items
+        outside PNL_LINE_ITEMS are left out
+        Returns: number of rows written
+        """
+        if statement_ids is not None:
+            statement_ids = [int(statement_id) for statement_id in statement_ids]
+            if not statement_ids:
+                return 0
+            where = "AND fs.id IN (SELECT UNNEST(?::INTEGER[]))"
+            params = [statement_ids]
+        else:
+            where, params = "", []
+
+        key_columns = ['location_code', 'year', 'month', 'period_date']
+        columns = ", ".join(quote_identifier(item) for item in PNL_LINE_ITEMS)
+        pivots = ", ".join(
+            f"MAX(p.amount) FILTER (WHERE p.line_item = {quote_literal(item)})"
+            for item in PNL_LINE_ITEMS
+        )
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in key_columns + [quote_identifier(item) for item in PNL_LINE_ITEMS]
+        )
+        rows = f"""
+            SELECT fs.id, fs.location_code, fs.year, fs.month, fs.period_date, {pivots}
+            FROM financial_statements fs
+            JOIN pnl_data p ON fs.id = p.statement_id
+            WHERE fs.processed {where}
+            GROUP BY fs.id, fs.location_code, fs.year, fs.month, fs.period_date
+        """
+        # Upsert rather than delete and insert: DuckDB rejects re-inserting
+        # a deleted key in the same transaction
+        with self.transaction():
+            written = self.conn.execute(f"""
+                INSERT INTO pnl_monthly (statement_id, {", ".join(key_columns)}, {columns})
+                {rows}
+                ON CONFLICT (statement_id) DO UPDATE SET {updates}
+            """, params).fetchone()[0]
+            if statement_ids is None:
+                self.conn.execute("""
+                    DELETE FROM pnl_monthly
+                    WHERE statement_id NOT IN (
+                        SELECT DISTINCT fs.id
+                        FROM financial_statements fs
+                        JOIN pnl_data p ON fs.id = p.statement_id
+                        WHERE fs.processed
+                    )
+                """)
+                self.refresh_pnl_rollups()
+            else:
+                self.refresh_pnl_rollups(self.conn.execute("""
+                    SELECT DISTINCT year, month FROM financial_statements
+                    WHERE id IN (SELECT UNNEST(?::INTEGER[]))
+                """, params).fetchall())
+            return written
+
+    def bump_data_version(self):
+        """Mark the data as changed so cached query results are dropped"""
+        self.conn.execute("UPDATE data_version SET version = version + 1")
+
+    def get_data_version(self):
+        """
+        Current data version (increases whenever loaded data changes)
+        Returns: int
+        """
+        with self.cursor() as cursor:
+            return cursor.execute("SELECT version FROM data_version").fetchall()[0][0]
+
+    def refresh_pnl_rollups(self, periods=None):
+        """
+        Recompute the region and consolidated rollups of the given periods
+        from pnl_monthly (every period if periods is None)
+        periods: iterable of (year, month)
+        """
+        if periods is not None:
+            period_keys = sorted({int(year) * 100 + int(month) for year, month in periods})
+            if not period_keys:
+                return
+            where = "WHERE w.year * 100 + w.month IN (SELECT UNNEST(?::INTEGER[]))"
+            params = [period_keys]
+        else:
+            where, params = "", []
+
+        columns = ", ".join(quote_identifier(item) for item in PNL_LINE_ITEMS)
+        with self.transaction():
+            # Every change to loaded data passes through here
+            self.bump_data_version()
+            for table, group_columns in PNL_ROLLUPS.items():
+                keys = group_columns + ['year', 'month']
+                groups = ", ".join(f"l.{column}" for column in group_columns)
+                groups = f"{groups}, " if groups else ""
+                updates = ", ".join(
+                    f"{column} = EXCLUDED.{column}"
+                    for column in ['period_date', 'location_count'] + [quote_identifier(item) for item in PNL_LINE_ITEMS]
+                )
+                self.conn.execute(f"""
+                    INSERT INTO {table} ({", ".join(keys)}, period_date, location_count, {columns})
+                    SELECT {groups}w.year, w.month, w.period_date, COUNT(*), {PNL_SUMS}
+                    FROM pnl_monthly w
+                    JOIN locations l ON l.location_code = w.location_code
+                    {where}
+                    GROUP BY {groups}w.year, w.month, w.period_date
+                    ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}
+                """, params)
+
+                # A rebuild also drops groups left without any location
+                # (e.g. after a location changed region)
+                if periods is None:
+                    matches = " AND ".join(
+                        f"{'l' if column in group_columns else 'w'}.{column} = r.{column}" for column in keys
+                    )
+                    self.conn.execute(f"""
+                        DELETE FROM {table} r
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM pnl_monthly w
+                            JOIN locations l ON l.location_code = w.location_code
+                            WHERE {matches}
+                        )
+                    """)
+
     def mark_statement_processed(self, statement_id):
         """Mark a statement as processed"""
         self.conn.execute("""
@@ -165,81 +1017,90 @@ class FinancialDatabase:
             WHERE id = ?
         """, [statement_id])
 
-    def get_all_data(self):
-        """Get all financial data with location info"""
-        query = """
-            SELECT
-                l.location_code,
-                l.location_name,
-                l.city,
-                l.region,
-                l.status,
-                fs.year,
-                fs.month,
-                fs.period_date,
-                p.line_item,
-                p.amount
+    def get_all_data(self, start=None, end=None, regions=None, locations=None, line_items=None, arrow=False):
+        """
+        Get P&L data with location info, filtered in the query
+        start, end: period date bounds; regions, locations: lists of regions
+        / location codes; line_items: P&L columns to return (None for all);
+        arrow: return the cached pyarrow Table instead of a DataFrame
+        Returns: DataFrame with one row per location and period and one
+        column per P&L line item (without period bounds, locations without
+        data have one empty row); location columns are categorical
+        """
+        select = [
+            'l.location_code', 'l.location_name', 'l.city', 'l.region', 'l.status',
+            'w.year', 'w.month', 'w.period_date',
+        ] + pnl_columns(line_items)
+        conditions, params = pnl_filters(start, end, regions, None)
+        if locations is not None:
+            conditions.append("l.location_code IN (SELECT UNNEST(?::VARCHAR[]))")
+            params.append(list(locations))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT {", ".join(select)}
             FROM locations l
-            LEFT JOIN financial_statements fs ON l.location_code = fs.location_code
-            LEFT JOIN pnl_data p ON fs.id = p.statement_id
-            WHERE fs.processed = TRUE OR fs.id IS NULL
-            ORDER BY fs.year DESC, fs.month DESC, l.location_name, p.line_item
+            LEFT JOIN pnl_monthly w ON l.location_code = w.location_code
+            {where}
+            ORDER BY w.year DESC, w.month DESC, l.location_name
         """
-        return self.conn.execute(query).df()
+        return self.cached_query(query, params, arrow)
 
-    def get_data_by_location(self, location_code):
-        """Get financial data for a specific location"""
-        query = """
-            SELECT
-                fs.year,
-                fs.month,
-                fs.period_date,
-                p.line_item,
-                p.amount
-            FROM financial_statements fs
-            JOIN pnl_data p ON fs.id = p.statement_id
-            WHERE fs.location_code = ? AND fs.processed = TRUE
-            ORDER BY fs.year DESC, fs.month DESC, p.line_item
+    def get_data_by_location(self, location_code, start=None, end=None, line_items=None, arrow=False):
         """
-        return self.conn.execute(query, [location_code]).df()
+        Get P&L data for a specific location between optional period bounds
+        Returns: DataFrame with one row per period and one column per P&L line
+        item (pyarrow Table with arrow=True)
+        """
+        select = ['w.year', 'w.month', 'w.period_date'] + pnl_columns(line_items)
+        conditions, params = pnl_filters(start, end, locations=[location_code])
+        query = f"""
+            SELECT {", ".join(select)}
+            FROM pnl_monthly w
+            WHERE {' AND '.join(conditions)}
+            ORDER BY w.year DESC, w.month DESC
+        """
+        return self.cached_query(query, params, arrow)
 
-    def get_data_by_region(self, region):
-        """Get aggregated financial data for a region"""
-        query = """
-            SELECT
-                fs.year,
-                fs.month,
-                p.line_item,
-                SUM(p.amount) as amount
-            FROM locations l
-            JOIN financial_statements fs ON l.location_code = fs.location_code
-            JOIN pnl_data p ON fs.id = p.statement_id
-            WHERE l.region = ? AND fs.processed = TRUE
-            GROUP BY fs.year, fs.month, p.line_item
-            ORDER BY fs.year DESC, fs.month DESC, p.line_item
+    def get_data_by_region(self, region, start=None, end=None, line_items=None, arrow=False):
+        """
+        Get aggregated P&L data for a region from its rollup
+        Returns: DataFrame with one row per period, one column per P&L line
+        item and the number of locations reporting (pyarrow Table with
+        arrow=True)
         """
-        return self.conn.execute(query, [region]).df()
+        select = ['w.year', 'w.month', 'w.period_date'] + pnl_columns(line_items) + ['w.location_count']
+        conditions, params = pnl_filters(start, end)
+        conditions.insert(0, "w.region = ?")
+        params.insert(0, region)
+        query = f"""
+            SELECT {", ".join(select)}
+            FROM pnl_region_monthly w
+            WHERE {' AND '.join(conditions)}
+            ORDER BY w.year DESC, w.month DESC
+        """
+        return self.cached_query(query, params, arrow)
 
-    def get_consolidated_data(self):
-        """Get consolidated financial data across all locations"""
-        query = """
-            SELECT
-                fs.year,
-                fs.month,
-                p.line_item,
-                SUM(p.amount) as amount,
-                COUNT(DISTINCT fs.location_code) as location_count
-            FROM financial_statements fs
-            JOIN pnl_data p ON fs.id = p.statement_id
-            WHERE fs.processed = TRUE
-            GROUP BY fs.year, fs.month, p.line_item
-            ORDER BY fs.year DESC, fs.month DESC, p.line_item
+    def get_consolidated_data(self, start=None, end=None, line_items=None, arrow=False):
+        """
+        Get consolidated P&L data across all locations from its rollup
+        Returns: DataFrame with one row per period, one column per P&L line
+        item and the number of locations reporting (pyarrow Table with
+        arrow=True)
+        """
+        select = ['w.year', 'w.month', 'w.period_date'] + pnl_columns(line_items) + ['w.location_count']
+        conditions, params = pnl_filters(start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT {", ".join(select)}
+            FROM pnl_consolidated_monthly w
+            {where}
+            ORDER BY w.year DESC, w.month DESC
         """
-        return self.conn.execute(query).df()
+        return self.cached_query(query, params, arrow)
 
     def get_summary_stats(self):
         """Get summary statistics"""
-        return self.conn.execute("""
+        return self.cached_query("""
             SELECT
                 COUNT(DISTINCT location_code) as total_locations,
                 COUNT(*) as total_statements,
@@ -247,17 +1108,186 @@ class FinancialDatabase:
                 MAX(period_date) as latest_date
             FROM financial_statements
             WHERE processed = TRUE
-        """).df()
+        """)
+
+    def publish_snapshot(self, snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP, force=False):
+        """
+        Publish a read-only copy of the database for the dashboard
+        The database is checkpointed and copied to a new snapshot file, then
+        the snapshot pointer is switched to it with one atomic rename, so
+        readers never see a partial file and never hold a lock on this one.
+        Skipped when the current snapshot already has this data version.
+        Returns: path of the new snapshot, or None if skipped or failed
+        """
+        snapshot_dir = Path(snapshot_dir)
+        version = self.get_data_version()
+        current = latest_snapshot(snapshot_dir)
+        if (not force and current and current['version'] == version
+                and (snapshot_dir / current['file']).exists()):
+            return None
+
+        file_name = f"{Path(self.db_path).stem}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}.v{version}.duckdb"
+        snapshot_path = snapshot_dir / file_name
+        tmp_path = snapshot_path.with_suffix('.tmp')
+        pointer_tmp = (snapshot_dir / SNAPSHOT_POINTER).with_suffix(f".{os.getpid()}.tmp")
+        try:
+            # Write everything from the WAL into the database file first
+            # (idle cursors are closed so none holds a transaction open)
+            self.close_idle_cursors()
+            self.conn.execute("CHECKPOINT")
+            shutil.copyfile(self.db_path, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, snapshot_path)
+
+            with open(pointer_tmp, 'w') as f:
+                json.dump({
+                    'file': file_name,
+                    'version': version,
+                    'published_at': datetime.now().isoformat(timespec='seconds'),
+                }, f)
+            os.replace(pointer_tmp, snapshot_dir / SNAPSHOT_POINTER)
+        except (OSError, duckdb.Error) as e:
+            print(f"Warning: Could not publish snapshot: {e}")
+            tmp_path.unlink(missing_ok=True)
+            pointer_tmp.unlink(missing_ok=True)
+            return None
+
+        # Older snapshots stay readable for processes that still have them open
+        for old_snapshot in sorted(snapshot_dir.glob(f"{Path(self.db_path).stem}.*.duckdb"))[:-keep]:
+            old_snapshot.unlink(missing_ok=True)
+
+        print(f"✓ Published snapshot {file_name}")
+        return snapshot_path
+
+    def close_idle_cursors(self):
+        """Close the pooled cursors not in use (new ones are opened on demand)"""
+        with self.pool_lock:
+            for cursor in self.idle_cursors:
+                cursor.close()
+            self.idle_cursors = []
 
     def close(self):
-        """Close database connection"""
+        """Close database connection and its pooled cursors"""
+        self.close_idle_cursors()
         if self.conn:
             self.conn.close()
 
 
+def latest_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Read the snapshot pointer
+    Returns: dict with the snapshot 'file', data 'version' and
+    'published_at', or None if nothing has been published
+    """
+    try:
+        with open(Path(snapshot_dir) / SNAPSHOT_POINTER, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotReader:
+    """
+    Read-only access to the newest published snapshot
+    Query methods are called on the current snapshot's FinancialDatabase.
+    Every call checks the snapshot pointer, and a newly published snapshot
+    is opened and swapped in without a restart; the old one closes when its
+    last running query finishes. The ingest database itself is never opened
+    here: processing publishes the snapshots.
+    """
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.db = None
+        self.file_name = None
+        self.pointer_key = None
+
+    def _pointer_key(self):
+        """Identity of the pointer file (a publish replaces it)"""
+        try:
+            stat = (self.snapshot_dir / SNAPSHOT_POINTER).stat()
+            return stat.st_ino, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def current(self):
+        """
+        The FinancialDatabase of the newest snapshot (an empty database
+        until the first snapshot is published)
+        Returns: FinancialDatabase
+        """
+        key = self._pointer_key()
+        if self.db is not None and key == self.pointer_key:
+            return self.db
+
+        with self.lock:
+            key = self._pointer_key()
+            if self.db is not None and key == self.pointer_key:
+                return self.db
+
+            snapshot = latest_snapshot(self.snapshot_dir)
+            if snapshot is None:
+                if self.db is None:
+                    print("No snapshot published yet; showing no data until processing publishes one")
+                    self.db = FinancialDatabase(':memory:')
+            elif snapshot['file'] != self.file_name:
+                try:
+                    self.db = FinancialDatabase(self.snapshot_dir / snapshot['file'], read_only=True)
+                    self.file_name = snapshot['file']
+                except duckdb.Error as e:
+                    print(f"Warning: Could not open snapshot {snapshot['file']}: {e}")
+                    if self.db is None:
+                        self.db = FinancialDatabase(':memory:')
+            self.pointer_key = key
+            return self.db
+
+    def __getattr__(self, name):
+        """Query methods of the current snapshot"""
+        return getattr(self.current(), name)
+
+    def close(self):
+        """Close the current snapshot"""
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+            self.db = None
+            self.file_name = None
+            self.pointer_key = None
+
+
+_shared_readers = {}
+_shared_lock = threading.Lock()
+
+
+def shared_database(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Process-wide snapshot reader for the dashboard
+    Panel runs dashboard.py once per session; every session in the process
+    shares the open snapshot and borrows cursors from its pool. A forked
+    worker process (panel serve --num-procs) gets its own reader rather
+    than its parent's connections.
+    Returns: SnapshotReader
+    """
+    with _shared_lock:
+        reader = _shared_readers.get(snapshot_dir)
+        if reader is None or reader.pid != os.getpid():
+            reader = _shared_readers[snapshot_dir] = SnapshotReader(snapshot_dir)
+        return reader
+
+
 # Initialize database on import
 if __name__ == "__main__":
+    import sys
+
     db = FinancialDatabase()
     print("Database initialized successfully")
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        # Rebuild the wide P&L table and its rollups from pnl_data
+        rows = db.refresh_pnl_monthly()
+        print(f"Rebuilt P&L tables ({rows} location-months)")
+    # Publish a dashboard snapshot if the data changed ('publish' forces one)
+    db.publish_snapshot(force=len(sys.argv) > 1 and sys.argv[1] == 'publish')
     print(db.get_summary_stats())
     db.close()
@@ -0,0 +1,157 @@
+"""
+Archive of raw PDF extractions for re-matching line items
+Each parse stores the text lines and table cells it extracted as one
+compressed Parquet file, keyed by the SHA-256 of the PDF bytes (plus the
+page range for consolidated packets). When line item names change, the
+archive can be matched again without re-reading any PDFs.
+"""
+
+import os
+import hashlib
+from datetime import datetime
+from pathlib import Path
+import duckdb
+import pandas as pd
+from config import ARCHIVE_DIR
+
+# Per-parse columns, repeated on every row (compression makes that cheap)
+METADATA_COLUMNS = ['file_hash', 'file_name', 'location_code', 'year', 'month', 'statement_type', 'tier', 'archived_at']
+
+# Archive columns, in file order
+ARCHIVE_COLUMNS = """
+    CAST(file_hash AS VARCHAR) AS file_hash,
+    CAST(file_name AS VARCHAR) AS file_name,
+    CAST(location_code AS VARCHAR) AS location_code,
+    CAST(year AS INTEGER) AS year,
+    CAST(month AS INTEGER) AS month,
+    CAST(statement_type AS VARCHAR) AS statement_type,
+    CAST(tier AS VARCHAR) AS tier,
+    CAST(archived_at AS TIMESTAMP) AS archived_at,
+    CAST(page AS INTEGER) AS page,
+    CAST(section AS VARCHAR) AS section,
+    CAST(table_index AS INTEGER) AS table_index,
+    CAST(row_index AS INTEGER) AS row_index,
+    CAST(col_index AS INTEGER) AS col_index,
+    CAST(value AS VARCHAR) AS value
+"""
+
+
+class ExtractionArchive:
+    """Stores extracted pages as one ZSTD-compressed Parquet file per parse"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, file_hash, page_numbers=None):
+        """Path of the archive entry for a file (or a page range of it)"""
+        if page_numbers is None:
+            return self.archive_dir / f"{file_hash}.parquet"
+        pages_key = hashlib.sha256(",".join(map(str, page_numbers)).encode('utf-8')).hexdigest()[:16]
+        return self.archive_dir / f"{file_hash}_{pages_key}.parquet"
+
+    def put(self, file_hash, metadata, pages, page_numbers=None):
+        """
+        Archive the pages of one parse
+        metadata holds file_name, location_code, year, month, statement_type
+        and tier; text lines are stored with a NULL table_index
+        """
+        rows = []
+        for page in pages:
+            for line_index, line in enumerate(page['text'].split('\n')):
+                if line:
+                    rows.append((page['index'], page['section'], None, line_index, None, line))
+            for table_index, table in enumerate(page['tables']):
+                for row_index, row in enumerate(table):
+                    for col_index, cell in enumerate(row):
+                        rows.append((page['index'], page['section'], table_index, row_index, col_index, cell))
+
+        cells = pd.DataFrame(rows, columns=['page', 'section', 'table_index', 'row_index', 'col_index', 'value'])
+        metadata = dict(metadata, file_hash=file_hash, archived_at=datetime.now())
+        for key in reversed(METADATA_COLUMNS):
+            cells.insert(0, key, metadata[key])
+
+        entry = self._entry_path(file_hash, page_numbers)
+        tmp_path = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            conn = duckdb.connect()
+            conn.register('cells', cells)
+            conn.execute(
+                f"COPY (SELECT {ARCHIVE_COLUMNS} FROM cells) TO '{tmp_path}' (FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+            conn.close()
+            # Atomic so concurrent parsers never read a partial entry
+            os.replace(tmp_path, entry)
+        except Exception as e:
+            print(f"Warning: Could not write extraction archive entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def entries(self):
+        """
+        Read archive entries one at a time, so memory stays bounded by the
+        largest file rather than the whole history
+        Yields: (metadata dict, list of page dicts)
+        """
+        conn = duckdb.connect()
+        try:
+            for entry in sorted(self.archive_dir.glob("*.parquet")):
+                try:
+                    rows = conn.execute(f"SELECT * FROM read_parquet('{entry}')").fetchall()
+                except Exception as e:
+                    print(f"Warning: Could not read extraction archive entry {entry.name}: {e}")
+                    continue
+                if rows:
+                    yield archived_entry(rows)
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return (entry count, total bytes)"""
+        sizes = [entry.stat().st_size for entry in self.archive_dir.glob("*.parquet")]
+        return len(sizes), sum(sizes)
+
+
+def archived_entry(rows):
+    """
+    Rebuild one parse's metadata and extracted pages from its archived rows
+    Returns: (metadata dict, list of page dicts)
+    """
+    metadata = dict(zip(METADATA_COLUMNS, rows[0][:len(METADATA_COLUMNS)]))
+
+    # Pages in file order; template reads can put two statements on one page
+    pages = {}
+    for page_index, section, table_index, row_index, col_index, value in (row[len(METADATA_COLUMNS):] for row in rows):
+        page = pages.setdefault((page_index, section), {'lines': {}, 'tables': {}})
+        if table_index is None:
+            page['lines'][row_index] = value
+        else:
+            page['tables'].setdefault(table_index, {}).setdefault(row_index, {})[col_index] = value
+
+    extracted = []
+    for (page_index, section), page in pages.items():
+        lines = page['lines']
+        text = '\n'.join(lines.get(i, '') for i in range(max(lines) + 1)) if lines else ''
+        tables = []
+        for table_index in sorted(page['tables']):
+            table_rows = page['tables'][table_index]
+            table = []
+            for row_index in range(max(table_rows) + 1):
+                cells = table_rows.get(row_index, {})
+                table.append([cells[col_index] for col_index in sorted(cells)])
+            tables.append(table)
+        extracted.append({
+            'index': page_index,
+            'section': section,
+            'text': text,
+            'tables': tables,
+            'layouts': [],
+        })
+    return metadata, extracted
+
+
+if __name__ == "__main__":
+    archive = ExtractionArchive()
+    count, size = archive.stats()
+    print(f"Extraction archive: {archive.archive_dir}")
+    print(f"  Entries: {count}")
+    print(f"  Size: {size / (1024 * 1024):.1f} MB")
@@ -0,0 +1,63 @@
+"""
+Per-location layout templates for statement PDFs
+Each location's accountant sends the same layout every month. After a
+statement is parsed with full table detection, the parser remembers where
+it was (page, crop box and the x-ranges of the label and amount columns)
+so later months can read words straight from those regions.
+"""
+
+import os
+import json
+from pathlib import Path
+from config import CACHE_DIR
+
+
+class LayoutTemplateStore:
+    """Stores one JSON file of layout templates per location"""
+
+    def __init__(self, templates_dir=CACHE_DIR / "layouts"):
+        self.templates_dir = Path(templates_dir)
+        self.templates_dir.mkdir(parents=True, exist_ok=True)
+
+    def _location_path(self, location_code):
+        """Path of the template file for a location"""
+        return self.templates_dir / f"{location_code}.json"
+
+    def _load(self, location_code):
+        """Load all templates for a location"""
+        try:
+            with open(self._location_path(location_code), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, location_code, templates):
+        """Write all templates for a location atomically"""
+        path = self._location_path(location_code)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(templates, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not save layout template for {location_code}: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def get(self, location_code, statement_type):
+        """
+        Get templates for a location and file statement type
+        Returns: dict of {statement code: template}
+        """
+        return self._load(location_code).get(statement_type, {})
+
+    def save(self, location_code, statement_type, code, template):
+        """Save the template for one statement of a location's files"""
+        templates = self._load(location_code)
+        templates.setdefault(statement_type, {})[code] = template
+        self._write(location_code, templates)
+
+    def discard(self, location_code, statement_type, code):
+        """Forget a template whose checks failed"""
+        templates = self._load(location_code)
+        if templates.get(statement_type, {}).pop(code, None) is not None:
+            self._write(location_code, templates)
@@ -0,0 +1,151 @@
+"""
+Dashboard load test
+Starts `panel serve dashboard.py` with 1, 2, ... worker processes and opens
+many sessions at once. Each page load creates a Panel session, which runs
+dashboard.py and builds the login and dashboard widgets. Sessions per second
+are reported for each worker count, and with N workers on a machine with N
+free cores throughput should be close to N times that of one worker.
+
+Run it on the machine that serves the dashboard, after `python database.py`
+and `python auth.py` (start_dashboard.sh does both). Multiple workers need
+Linux or macOS.
+
+Usage:
+    python load_test_dashboard.py                    # 1, 2 and 4 workers
+    python load_test_dashboard.py --procs 1 4 --sessions 400 --concurrency 32
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from config import BASE_DIR
+
+# Throughput with N workers must reach this fraction of N x one worker
+DEFAULT_MIN_EFFICIENCY = 0.7
+
+
+def start_server(procs, port):
+    """Start panel serve with the given number of worker processes"""
+    return subprocess.Popen(
+        ['panel', 'serve', 'dashboard.py', '--port', str(port),
+         '--num-procs', str(procs), '--allow-websocket-origin=*'],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def stop_server(server):
+    """Stop panel serve and its worker processes"""
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+
+def open_session(url):
+    """
+    Load the dashboard page (creates one session)
+    Returns: (seconds, error message or None)
+    """
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=120) as response:
+            response.read()
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def wait_until_ready(url, timeout=120):
+    """Wait for the server to answer; returns False on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if open_session(url)[1] is None:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def run_load(url, sessions, concurrency):
+    """
+    Open sessions with concurrency requests in flight
+    Returns: dict with sessions/sec, latency percentiles and error count
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(open_session, [url] * sessions))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds for seconds, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    return {
+        'sessions_per_sec': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session throughput of the dashboard with 1..N worker processes")
+    parser.add_argument('--procs', type=int, nargs='+', default=[1, 2, 4], help="Worker counts to test")
+    parser.add_argument('--sessions', type=int, default=200, help="Sessions opened per worker count")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight at once")
+    parser.add_argument('--port', type=int, default=5099, help="Port for the test server")
+    parser.add_argument('--min-efficiency', type=float, default=DEFAULT_MIN_EFFICIENCY,
+                        help="Fail if N workers give less than this fraction of N x one worker")
+    args = parser.parse_args()
+
+    if max(args.procs) >= (os.cpu_count() or 1):
+        print(f"Warning: {os.cpu_count()} CPUs; leave one free for the load generator "
+              f"or results will understate scaling")
+
+    url = f"http://localhost:{args.port}/dashboard"
+    results = {}
+    for procs in args.procs:
+        print(f"Starting {procs} worker process(es)...")
+        server = start_server(procs, args.port)
+        try:
+            if not wait_until_ready(url):
+                print(f"✗ Server with {procs} worker(s) did not start")
+                return 1
+            # Warm up every worker (imports, snapshot open) before timing
+            run_load(url, procs * args.concurrency, args.concurrency)
+            results[procs] = run_load(url, args.sessions, args.concurrency)
+        finally:
+            stop_server(server)
+
+    base = results.get(1) or results[min(results)]
+    base_procs = 1 if 1 in results else min(results)
+    print(f"\n{'Workers':<9}{'Sessions/s':>12}{'Speedup':>10}{'Efficiency':>12}{'p50':>8}{'p95':>8}{'Errors':>8}")
+    failed = False
+    for procs, result in sorted(results.items()):
+        speedup = result['sessions_per_sec'] / base['sessions_per_sec'] if base['sessions_per_sec'] else 0.0
+        efficiency = speedup / (procs / base_procs)
+        print(f"{procs:<9}{result['sessions_per_sec']:>12.1f}{speedup:>9.2f}x{efficiency:>11.0%}"
+              f"{result['p50']:>8.2f}{result['p95']:>8.2f}{result['errors']:>8}")
+        if result['first_error']:
+            print(f"  first error: {result['first_error']}")
+        if result['errors'] or efficiency < args.min_efficiency:
+            failed = True
+
+    if failed:
+        print(f"\n✗ Scaling below {args.min_efficiency:.0%} of linear or sessions failed")
+        return 1
+    print(f"\n✓ Every worker count reached {args.min_efficiency:.0%} of linear scaling")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+On-disk cache of parsed financial statements
+Results are keyed by the SHA-256 of the PDF bytes plus a hash of the parser
+configuration, so an unchanged file is never parsed twice
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from config import CACHE_DIR, PARSE_CACHE_MAX_MB
+
+
+def file_sha256(file_path):
+    """Return the SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Stores parse_pdf results as JSON files with size-based LRU eviction"""
+
+    def __init__(self, cache_dir=CACHE_DIR / "parsed", max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, file_hash, config_hash):
+        """Path of the cache entry for a file/config pair"""
+        key = hashlib.sha256(f"{file_hash}:{config_hash}".encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, file_hash, config_hash):
+        """Return the cached result or None"""
+        entry = self._entry_path(file_hash, config_hash)
+        try:
+            with open(entry, 'r') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Touch the entry so eviction drops least recently used files first
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return result
+
+    def put(self, file_hash, config_hash, result):
+        """Store a result, then evict old entries if over the size limit"""
+        entry = self._entry_path(file_hash, config_hash)
+        tmp_path = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            # Atomic so concurrent parsers never read a partial entry
+            os.replace(tmp_path, entry)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write parse cache entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for entry in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, entry in sorted(entries):
+            entry.unlink(missing_ok=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Return (entry count, total bytes)"""
+        sizes = [entry.stat().st_size for entry in self.cache_dir.glob("*.json")]
+        return len(sizes), sum(sizes)
+
+    def clear(self):
+        """Remove every cache entry"""
+        for entry in self.cache_dir.glob("*.json"):
+            entry.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = ParseCache()
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        cache.clear()
+        print(f"Cleared parse cache: {cache.cache_dir}")
+    else:
+        count, size = cache.stats()
+        print(f"Parse cache: {cache.cache_dir}")
+        print(f"  Entries: {count}")
+        print(f"  Size: {size / (1024 * 1024):.1f} MB (limit {cache.max_bytes / (1024 * 1024):.0f} MB)")
@@ -0,0 +1,199 @@
+"""
+Isolated worker processes for PDF parsing
+Each file is parsed in its own process with a wall-clock timeout and a
+memory (RSS) limit, so a malformed or scanned PDF cannot stall or exhaust
+the machine. Files that hit a limit or crash the parser are recorded in a
+quarantine list and skipped until their contents change.
+"""
+
+import os
+import json
+import time
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from datetime import datetime
+from pathlib import Path
+from parse_cache import file_sha256
+from config import PARSE_TIMEOUT_SECONDS, PARSE_MAX_RSS_MB, QUARANTINE_FILE
+
+# How often running workers are checked against the limits
+POLL_SECONDS = 0.2
+
+
+def _worker_context():
+    """
+    Start workers from a clean fork server where available: it is fast and
+    safe when the caller has threads running
+    Each worker re-runs the calling script's module body, so the fork server
+    preloads the modules the scripts import (pandas, DuckDB, the parser)
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['process_financials'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _run_task(conn, function, args):
+    """Worker process entry point: send back (ok, result or error message)"""
+    try:
+        conn.send((True, function(*args)))
+    except BaseException as e:
+        conn.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def process_rss_mb(pid):
+    """
+    Resident memory of a process in MB (Linux /proc)
+    Returns: float or None where not available
+    """
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def run_isolated(tasks, jobs=1, timeout=PARSE_TIMEOUT_SECONDS, max_rss_mb=PARSE_MAX_RSS_MB):
+    """
+    Run tasks, each in its own worker process, at most jobs at a time
+    A worker that runs longer than timeout seconds or uses more than
+    max_rss_mb of memory is killed
+    tasks: iterable of (key, function, args); function must be importable
+    Yields: (key, result, error) as tasks finish; error is None on success,
+    otherwise the reason the task failed
+    """
+    context = _worker_context()
+    pending = list(tasks)
+    running = {}  # receiving connection -> (key, process, start time)
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            key, function, args = pending.pop(0)
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_task, args=(sender, function, args), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (key, process, time.monotonic())
+
+        for receiver in wait(list(running), timeout=POLL_SECONDS):
+            key, process, _ = running.pop(receiver)
+            try:
+                ok, value = receiver.recv()
+            except EOFError:
+                # Died without reporting (e.g. killed by the OS or a segfault)
+                process.join()
+                yield key, None, f"worker crashed (exit code {process.exitcode})"
+                continue
+            finally:
+                receiver.close()
+            process.join()
+            yield key, (value if ok else None), (None if ok else value)
+
+        now = time.monotonic()
+        for receiver, (key, process, started) in list(running.items()):
+            reason = None
+            if now - started > timeout:
+                reason = f"timed out after {timeout}s"
+            else:
+                rss_mb = process_rss_mb(process.pid)
+                if rss_mb is not None and rss_mb > max_rss_mb:
+                    reason = f"exceeded memory limit ({rss_mb:.0f} MB > {max_rss_mb} MB)"
+            if reason:
+                process.kill()
+                process.join()
+                receiver.close()
+                del running[receiver]
+                yield key, None, reason
+
+
+class Quarantine:
+    """Files that timed out, ran out of memory or crashed the parser"""
+
+    # Files are parsed on several threads; updates to the list (and its
+    # temporary file) must not interleave, whichever instance makes them
+    lock = threading.Lock()
+
+    def __init__(self, path=QUARANTINE_FILE):
+        self.path = Path(path)
+
+    def _load(self):
+        """Load the quarantine list"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        """Write the quarantine list atomically"""
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not update quarantine list: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def get(self, file_path):
+        """
+        Look up a file in the quarantine list
+        A file whose contents changed since it was quarantined is released
+        Returns: quarantine entry dict or None
+        """
+        file_path = Path(file_path)
+        entry = self._load().get(file_path.name)
+        if entry and entry['file_hash'] == file_sha256(file_path):
+            return entry
+        return None
+
+    def add(self, file_path, reason):
+        """Quarantine a file with the reason it failed"""
+        file_path = Path(file_path)
+        entry = {
+            'file_hash': file_sha256(file_path),
+            'reason': reason,
+            'quarantined_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self.lock:
+            entries = self._load()
+            entries[file_path.name] = entry
+            self._write(entries)
+        print(f"✗ Quarantined {file_path.name}: {reason}")
+
+    def release(self, file_name):
+        """Remove a file from the quarantine list so it is parsed again"""
+        with self.lock:
+            entries = self._load()
+            if entries.pop(file_name, None) is None:
+                return False
+            self._write(entries)
+        return True
+
+    def entries(self):
+        """Return every quarantined file as {file_name: entry}"""
+        return self._load()
+
+
+if __name__ == "__main__":
+    import sys
+
+    quarantine = Quarantine()
+    if len(sys.argv) > 2 and sys.argv[1] == 'release':
+        for file_name in sys.argv[2:]:
+            if quarantine.release(file_name):
+                print(f"Released {file_name}")
+            else:
+                print(f"Not quarantined: {file_name}")
+    else:
+        entries = quarantine.entries()
+        print(f"Quarantined files: {len(entries)}")
+        for file_name, entry in sorted(entries.items()):
+            print(f"  {file_name} ({entry['quarantined_at']}): {entry['reason']}")
@@ -4,20 +4,311 @@ Extracts P&L data from PDF files
 """
 
 import re
+import json
+import time
+import hashlib
+from collections import Counter
+from contextlib import contextmanager
 import pdfplumber
+import numpy as np
 import pandas as pd
+from PyPDF2 import PdfReader
 from pathlib import Path
 from datetime import datetime
-from config import PNL_LINE_ITEMS, BALANCE_SHEET_ITEMS, CASH_FLOW_ITEMS, LOCATIONS
+from config import (
+    PNL_LINE_ITEMS, BALANCE_SHEET_ITEMS, CASH_FLOW_ITEMS, LOCATIONS,
+    STATEMENT_SECTION_HEADERS, REQUIRED_LINE_ITEMS
+)
+from parse_cache import ParseCache, file_sha256
+from layout_templates import LayoutTemplateStore
+from extraction_archive import ExtractionArchive
+
+# Bump when a parser change alters results, so cached parses are not reused
+PARSER_VERSION = 8
+
+# Parse stages timed in stage_times
+PARSE_STAGES = ['hash', 'open', 'text', 'tables', 'matching', 'archive']
+
+# Statement type codes, in the order statements appear in a combined PDF
+STATEMENT_CODES = ['IS', 'BS', 'CF']
+
+# Number of lines at the top of a page searched for a statement header
+SECTION_HEADER_LINES = 5
+
+# Slack (in PDF points) when cropping and grouping words with layout templates
+LAYOUT_TOLERANCE = 3
+
+# Words of a statement text line; a lone "$" or "(" stays with the word
+# after it and a lone ")" with the word before it, so "$ -", "$ (1,234.56)"
+# and "( 1,234.56 )" are single tokens
+AMOUNT_TOKEN_PATTERN = re.compile(r'(?:[\$\(]\s+)*\S+(?:\s+\))*')
+
+# A table cell holding exactly one amount, e.g. $1,234.56, (1,234.56),
+# ($1,234.56), $ (1,234.56) (accounting format), -1,234.56, $-1,234.56 or
+# 1,234.56- (trailing minus)
+AMOUNT_CELL_PATTERN = re.compile(
+    r'^(?:\$\s*(?=\())?(?P<open>\()?\s*(?P<sign>-)?\s*\$?\s*(?P<sign_after>-)?\s*'
+    r'(?P<number>\d[\d,]*(?:\.\d*)?|\.\d+)'
+    r'\s*(?P<trailing>-)?\s*(?P<close>\))?$'
+)
+
+# Accounting zero written as a dash: -, $ -, –, —
+DASH_ZERO_PATTERN = re.compile(r'^\$?\s*[-–—]+\s*$')
+
+
+def parse_amount_text(value):
+    """
+    Parse one monetary string
+    Returns: float, or NaN if the value is not an amount
+    """
+    value = str(value).strip()
+    if DASH_ZERO_PATTERN.match(value):
+        return 0.0
+
+    match = AMOUNT_CELL_PATTERN.match(value)
+    if not match:
+        return np.nan
+
+    amount = float(match.group('number').replace(',', ''))
+    is_negative = (
+        (match.group('open') and match.group('close'))
+        or match.group('sign') or match.group('sign_after') or match.group('trailing')
+    )
+    return -amount if is_negative else amount
+
+
+def line_amounts(line):
+    """
+    Amounts in the columns at the end of a statement text line
+    Tokens are read back from the end of the line while they parse as
+    amounts (signs, parentheses, trailing minus and dash zeros included);
+    percentage columns such as "30.3%" are skipped
+    Returns: list of floats, left to right
+    """
+    amounts = []
+    for token in reversed(AMOUNT_TOKEN_PATTERN.findall(line)):
+        if '%' in token:
+            continue
+        amount = parse_amount_text(token)
+        if np.isnan(amount):
+            break
+        amounts.append(amount)
+    return amounts[::-1]
+
+
+def parse_amount_series(values):
+    """
+    Parse a whole column of monetary strings at once
+    Accepts a pandas Series, NumPy array or list. Each distinct string is
+    parsed once and the results are broadcast back, so repeated cells
+    (blanks, dashes, zeros) cost nothing extra
+    Returns: float Series (NaN where a cell is not an amount)
+    """
+    cells = pd.Series(values, dtype='object')
+    codes, uniques = pd.factorize(cells)
+    parsed = np.array([parse_amount_text(value) for value in uniques] + [np.nan], dtype='float64')
+    # Missing cells get code -1, which picks the trailing NaN
+    return pd.Series(parsed[codes], index=cells.index)
+
+
+def pdfplumber_pages(page_numbers):
+    """Convert 0-based page numbers to pdfplumber's 1-based pages argument"""
+    if page_numbers is None:
+        return None
+    return [page_number + 1 for page_number in page_numbers]
+
+
+MONTH_NUMBERS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+# A column header naming one month: "Jan 2025", "January", "Sep-25",
+# "Sept '25", "01/2025" or "2025-01"
+MONTH_NAME = (
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|"
+    r"aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+)
+PERIOD_HEADER_PATTERN = re.compile(
+    rf"^(?:(?P<name>{MONTH_NAME})\.?(?:[\s\-/',]*(?P<year>\d{{4}}|\d{{2}}))?"
+    r"|(?P<month>\d{1,2})/(?P<slash_year>\d{4}|\d{2})"
+    r"|(?P<iso_year>\d{4})-(?P<iso_month>\d{2}))$",
+    re.IGNORECASE
+)
+PERIOD_TOKEN_PATTERN = re.compile(
+    rf"\b(?:{MONTH_NAME})\.?(?:[\s\-/']*(?:\d{{4}}|\d{{2}}))?(?![\w])",
+    re.IGNORECASE
+)
+# Other words a month header line may carry ("Account  Jan  Feb  ...  Total")
+PERIOD_HEADER_WORDS_PATTERN = re.compile(
+    r"\b(?:accounts?|descriptions?|line items?|total|ytd|year to date|t12|ttm)\b",
+    re.IGNORECASE
+)
+
+
+def parse_period_header(text, file_year, file_month):
+    """
+    Parse a column header naming a single month
+    Headers without a year belong to the twelve months ending with the
+    file's own period (e.g. "Dec" in a 2026-01 file is December 2025)
+    Returns: (year, month) or None
+    """
+    if not text:
+        return None
+    match = PERIOD_HEADER_PATTERN.match(str(text).strip())
+    if not match:
+        return None
+
+    if match.group('name'):
+        month = MONTH_NUMBERS[match.group('name')[:3].lower()]
+        year = match.group('year')
+    elif match.group('month'):
+        month = int(match.group('month'))
+        year = match.group('slash_year')
+    else:
+        month = int(match.group('iso_month'))
+        year = match.group('iso_year')
+
+    if not 1 <= month <= 12:
+        return None
+    if year is None:
+        year = file_year if month <= file_month else file_year - 1
+    else:
+        year = int(year)
+        if year < 100:
+            year += 2000
+    return year, month
+
+
+def period_columns(cells, file_year, file_month):
+    """
+    Find the month columns in a header row
+    Returns: list of (column index, (year, month)) when the row names at
+    least two distinct months, otherwise an empty list
+    """
+    columns = [
+        (j, period)
+        for j, period in ((j, parse_period_header(cell, file_year, file_month)) for j, cell in enumerate(cells))
+        if period
+    ]
+    periods = [period for _, period in columns]
+    if len(set(periods)) < 2 or len(set(periods)) != len(periods):
+        return []
+    return columns
+
+
+class LineItemMatcher:
+    """
+    Finds configured line item names in text with one regex scan
+    Matching is case-insensitive substring matching. A line item that only
+    occurs inside a longer one is not reported (e.g. "Net Property &
+    Equipment" does not also hit "Property & Equipment")
+    """
+
+    def __init__(self, line_items):
+        self.items = set(line_items)
+        by_key = {item.lower(): item for item in line_items}
+
+        # Longest names first so the scan reports the longest item starting
+        # at each position
+        keys = sorted(by_key, key=len, reverse=True)
+        self.by_key = by_key
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in keys) + '))')
+
+    def find(self, text):
+        """Return every line item found in text, in order of appearance"""
+        hits = {}
+        if not text:
+            return []
+        covered = 0
+        for match in self.pattern.finditer(text.lower()):
+            # Skip items that lie inside a longer item already found
+            if match.end(1) <= covered:
+                continue
+            hits[self.by_key[match.group(1)]] = None
+            covered = match.end(1)
+        return list(hits)
+
+    def find_in_row(self, row):
+        """Return every line item found in the text cells of a table row"""
+        # Cells are joined with a newline so no match spans two cells
+        return self.find('\n'.join(cell for cell in row if isinstance(cell, str)))
+
+
+# Every location's statements for one month in one file
+CONSOLIDATED_FILENAME_PATTERN = r'(\d{4})-(\d{2})_CONSOLIDATED\.pdf'
+
+# Location names as they appear in page headers, with and without the store number
+LOCATION_CODES_BY_NAME = {
+    **{re.sub(r"\s*#\d+$", "", info['name']).lower(): code for code, info in LOCATIONS.items()},
+    **{info['name'].lower(): code for code, info in LOCATIONS.items()},
+}
+LOCATION_CODE_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(LOCATIONS, key=len, reverse=True)) + r")\b"
+)
 
 
 class FinancialStatementParser:
     """Parses financial statement PDFs and extracts financial data"""
 
-    def __init__(self):
+    def __init__(self, use_cache=True, tiered=True, use_layouts=True, use_archive=True):
         self.pnl_items = PNL_LINE_ITEMS
         self.balance_sheet_items = BALANCE_SHEET_ITEMS
         self.cash_flow_items = CASH_FLOW_ITEMS
+        self.statement_items = {
+            'IS': self.pnl_items,
+            'BS': self.balance_sheet_items,
+            'CF': self.cash_flow_items,
+        }
+        self.matcher = LineItemMatcher(
+            self.pnl_items + self.balance_sheet_items + self.cash_flow_items
+        )
+        self.location_matcher = LineItemMatcher(list(LOCATION_CODES_BY_NAME))
+        self.cache = ParseCache() if use_cache else None
+        self.tiered = tiered
+        self.layouts = LayoutTemplateStore() if use_layouts else None
+        self.archive = ExtractionArchive() if use_archive else None
+        # Seconds spent in each of PARSE_STAGES and pages opened by the last parse
+        self.stage_times = Counter()
+        self.page_count = 0
+
+    @contextmanager
+    def timed(self, stage):
+        """Add the time spent in the block to stage_times[stage]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[stage] += time.perf_counter() - start
+
+    def parse_stats(self, pdf_path, pages, statements):
+        """
+        Size and timing figures for the last parse
+        Returns: dict of pages, tables_found, items_matched, bytes_read and
+        stage_seconds
+        """
+        return {
+            'pages': self.page_count,
+            'tables_found': sum(len(page['tables']) for page in pages),
+            'items_matched': sum(len(data) for data in statements.values()),
+            'bytes_read': Path(pdf_path).stat().st_size,
+            'stage_seconds': {stage: round(self.stage_times[stage], 4) for stage in PARSE_STAGES},
+        }
+
+    def config_hash(self, statement_type, page_numbers=None):
+        """Hash of everything besides the PDF bytes that affects a parse result"""
+        config = {
+            'parser_version': PARSER_VERSION,
+            'statement_type': statement_type,
+            'tiered': self.tiered,
+            'pnl_items': self.pnl_items,
+            'balance_sheet_items': self.balance_sheet_items,
+            'cash_flow_items': self.cash_flow_items,
+        }
+        if page_numbers is not None:
+            # One location's pages of a consolidated packet
+            config['page_numbers'] = list(page_numbers)
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
 
     def parse_filename(self, filename):
         """
@@ -55,58 +346,478 @@ class FinancialStatementParser:
             print("  YYYY-MM_LocationCode_CF.pdf (cash flow)")
             return None
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract all text from PDF"""
-        text = ""
+    def parse_consolidated_filename(self, filename):
+        """
+        Parse the filename of a consolidated packet holding every location's
+        statements for one month: YYYY-MM_CONSOLIDATED.pdf
+        Returns: (year, month) or None if not a consolidated packet
+        """
+        match = re.match(CONSOLIDATED_FILENAME_PATTERN, filename)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+        return None
+
+    def detect_location(self, page_text):
+        """
+        Identify the location a page belongs to from its header lines
+        Location names are matched first, then location codes as whole words
+        Returns: location code or None if the page has no location header
+        """
+        # Long titles wrap, so compare with whitespace collapsed
+        header = ' '.join(' '.join(page_text.split('\n')[:SECTION_HEADER_LINES]).split())
+        names = self.location_matcher.find(header)
+        if names:
+            return LOCATION_CODES_BY_NAME[names[0].lower()]
+        match = LOCATION_CODE_PATTERN.search(header)
+        return match.group(1) if match else None
+
+    def find_location_pages(self, pdf_path):
+        """
+        Split a consolidated packet into each location's pages
+        Pages are read one at a time with the text-only reader. Pages
+        without a location header continue the previous location; pages
+        before the first location header (cover pages) are skipped.
+        Returns: dict of {location_code: [page numbers]} or None if failed
+        """
+        location_pages = {}
+        location_code = None
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n"
+            reader = PdfReader(str(pdf_path))
+            for page_number, page in enumerate(reader.pages):
+                location_code = self.detect_location(page.extract_text() or "") or location_code
+                if location_code:
+                    location_pages.setdefault(location_code, []).append(page_number)
         except Exception as e:
             print(f"Error reading PDF {pdf_path}: {e}")
             return None
-        return text
+        return location_pages
+
+    def detect_section(self, page_text):
+        """
+        Identify the statement a page belongs to from its header lines
+        Returns: 'IS', 'BS', 'CF' or None if the page has no statement header
+        """
+        header = '\n'.join(page_text.split('\n')[:SECTION_HEADER_LINES]).lower()
+        for code, phrases in STATEMENT_SECTION_HEADERS.items():
+            if any(phrase in header for phrase in phrases):
+                return code
+        return None
+
+    def extract_fast_text(self, pdf_path, statement_type='ALL', page_numbers=None):
+        """
+        Cheap text-only extraction with PyPDF2 (no layout or table analysis)
+        Pages are assigned to statement sections the same way as in
+        extract_pdf_content
+        Returns: list of page dicts (index, section, text, tables, layouts) or None
+        """
+        pages = []
+        section = None if statement_type == 'ALL' else statement_type
+        try:
+            with self.timed('open'):
+                reader = PdfReader(str(pdf_path))
+            if page_numbers is None:
+                page_numbers = range(len(reader.pages))
+            self.page_count = len(page_numbers)
+            for index, page_number in enumerate(page_numbers):
+                with self.timed('text'):
+                    text = reader.pages[page_number].extract_text() or ""
+                if statement_type == 'ALL':
+                    section = self.detect_section(text) or section
+                pages.append({
+                    'index': index,
+                    'section': section,
+                    'text': text,
+                    'tables': [],
+                    'layouts': [],
+                })
+        except Exception as e:
+            print(f"  Warning: Fast text extraction failed for {pdf_path}: {e}")
+            return None
+        return pages
+
+    def extract_pdf_content(self, pdf_path, statement_type='ALL', page_numbers=None):
+        """
+        Extract text and tables in a single pass over the PDF
+        Each page is laid out once and its cache released before moving on.
+        For combined (ALL) PDFs each page is assigned to a statement section
+        from its header; pages without a header continue the previous section.
+        Tables are only extracted from pages whose text mentions a line item
+        of their section, so schedules and detail pages skip table detection.
+        page_numbers limits extraction to those pages (0-based); page indexes
+        in the result are then positions within page_numbers.
+        Returns: list of page dicts (index, section, text, tables, layouts) or None
+        """
+        pages = []
+        section = None if statement_type == 'ALL' else statement_type
+        try:
+            with self.timed('open'):
+                pdf = pdfplumber.open(pdf_path, pages=pdfplumber_pages(page_numbers))
+            with pdf:
+                self.page_count = len(pdf.pages)
+                for index, page in enumerate(pdf.pages):
+                    with self.timed('text'):
+                        text = page.extract_text() or ""
+                    if statement_type == 'ALL':
+                        section = self.detect_section(text) or section
+
+                    if section:
+                        wanted = set(self.statement_items[section])
+                    else:
+                        wanted = self.matcher.items
+
+                    with self.timed('tables'):
+                        found_tables = []
+                        if any(item in wanted for item in self.matcher.find(text)):
+                            found_tables = page.find_tables()
+                        tables = [table.extract() for table in found_tables]
+                        layouts = [self.table_layout(table) for table in found_tables]
+
+                    pages.append({
+                        'index': index,
+                        'section': section,
+                        'text': text,
+                        'tables': tables,
+                        'layouts': layouts,
+                    })
+                    page.close()
+        except Exception as e:
+            print(f"Error reading PDF {pdf_path}: {e}")
+            return None
+        return pages
+
+    def split_sections(self, pages, statement_type):
+        """
+        Group extracted pages by statement
+        A statement whose header was never found falls back to the pages
+        no header assigned (never to another statement's pages, whose
+        lines such as the cash flow "Net Income" would overwrite its own)
+        Returns: dict of {statement code: (text, tables)}
+        """
+        codes = STATEMENT_CODES if statement_type == 'ALL' else [statement_type]
+        found = {page['section'] for page in pages}
+
+        sections = {}
+        for code in codes:
+            section = code if code in found else None
+            section_pages = [page for page in pages if page['section'] == section]
+            text = "".join(page['text'] + "\n" for page in section_pages)
+            tables = [table for page in section_pages for table in page['tables']]
+            sections[code] = (text, tables)
+        return sections
+
+    def table_layout(self, table):
+        """
+        Record where a pdfplumber table sits on its page
+        Returns: dict with the table bbox and the x-range of each column
+        """
+        columns = {}
+        for row in table.rows:
+            for j, cell in enumerate(row.cells):
+                if cell is None:
+                    continue
+                x0, x1 = columns.get(j, (cell[0], cell[2]))
+                columns[j] = (min(x0, cell[0]), max(x1, cell[2]))
+        return {
+            'bbox': list(table.bbox),
+            'columns': [list(columns[j]) if j in columns else None for j in range(max(columns, default=-1) + 1)],
+        }
+
+    def learn_layout(self, pages, code):
+        """
+        Build a layout template for a statement from a full table parse
+        Uses the table on the statement's pages with the most line item rows
+        Returns: template dict or None if no usable table was found
+        """
+        wanted = set(self.statement_items[code])
+        best = None
+        for page in pages:
+            if page['section'] not in (code, None):
+                continue
+            for table, layout in zip(page['tables'], page.get('layouts', [])):
+                hit_rows = []
+                label_columns = Counter()
+                for row in table[1:]:
+                    for j, cell in enumerate(row):
+                        if isinstance(cell, str) and any(item in wanted for item in self.matcher.find(cell)):
+                            label_columns[j] += 1
+                            hit_rows.append(row)
+                            break
+                if hit_rows and (best is None or len(hit_rows) > best[0]):
+                    best = (len(hit_rows), page['index'], layout, label_columns.most_common(1)[0][0], hit_rows)
+
+        if best is None:
+            return None
+
+        item_count, page_index, layout, label_column, hit_rows = best
+        _, amount_columns = self.find_amount_columns(hit_rows)
+        if not amount_columns.any():
+            return None
+        amount_column = int(amount_columns.argmax())
 
-    def extract_tables_from_pdf(self, pdf_path):
-        """Extract tables from PDF"""
-        tables = []
+        columns = layout['columns']
+        if max(label_column, amount_column) >= len(columns):
+            return None
+        if columns[label_column] is None or columns[amount_column] is None:
+            return None
+
+        return {
+            'page_index': page_index,
+            'bbox': layout['bbox'],
+            'label_x': columns[label_column],
+            'amount_x': columns[amount_column],
+            'item_count': item_count,
+        }
+
+    def read_layout_rows(self, page, template):
+        """
+        Read (label, amount) rows from a page using a layout template
+        Only the template's columns are cropped and read; rows may run past
+        the learned table bottom, so the crop extends to the end of the page
+        """
+        label_x0, label_x1 = template['label_x']
+        amount_x0, amount_x1 = template['amount_x']
+        top = max(0, template['bbox'][1] - LAYOUT_TOLERANCE)
+        region = page.crop((
+            max(0, min(label_x0, amount_x0) - LAYOUT_TOLERANCE),
+            top,
+            min(page.width, max(label_x1, amount_x1) + LAYOUT_TOLERANCE),
+            page.height,
+        ))
+
+        # Group words into lines by their vertical position
+        lines = []
+        for word in sorted(region.extract_words(), key=lambda w: (w['top'], w['x0'])):
+            if lines and word['top'] - lines[-1][0]['top'] <= LAYOUT_TOLERANCE:
+                lines[-1].append(word)
+            else:
+                lines.append([word])
+
+        rows = []
+        for line in lines:
+            label = []
+            amount = []
+            for word in line:
+                center = (word['x0'] + word['x1']) / 2
+                if label_x0 <= center <= label_x1:
+                    label.append(word['text'])
+                elif amount_x0 <= center <= amount_x1:
+                    amount.append(word['text'])
+            rows.append([' '.join(label), ''.join(amount)])
+        return rows
+
+    def extract_with_layouts(self, pdf_path, templates, statement_type, page_numbers=None):
+        """
+        Read each statement from its learned layout template
+        A template passes when its page still exists, the page header names
+        the same statement (combined PDFs), no month column headers appear,
+        every required line item is found and at least half as many items
+        match as when it was learned
+        Returns: (dict of {statement code: {line_item: amount}}, list of
+        page dicts holding the rows read), or None if any template fails
+        its checks
+        """
+        codes = STATEMENT_CODES if statement_type == 'ALL' else [statement_type]
+        statements = {}
+        pages = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_tables = page.extract_tables()
-                    if page_tables:
-                        tables.extend(page_tables)
+            with self.timed('open'):
+                pdf = pdfplumber.open(pdf_path, pages=pdfplumber_pages(page_numbers))
+            with pdf:
+                self.page_count = len(pdf.pages)
+                for code in codes:
+                    template = templates[code]
+                    if template['page_index'] >= len(pdf.pages):
+                        return None
+                    page = pdf.pages[template['page_index']]
+
+                    if statement_type == 'ALL':
+                        header_bottom = min(page.height, max(template['bbox'][1], LAYOUT_TOLERANCE))
+                        with self.timed('text'):
+                            header = page.crop((0, 0, page.width, header_bottom)).extract_text() or ""
+                        if self.detect_section(header) != code:
+                            return None
+
+                    with self.timed('tables'):
+                        rows = self.read_layout_rows(page, template)
+                    if any(parse_period_header(cell, 2000, 1) for row in rows for cell in row):
+                        # Month columns: the single-amount template doesn't fit
+                        return None
+                    with self.timed('matching'):
+                        data = self.extract_statement_data(None, [[[]] + rows], self.statement_items[code])
+                    page.close()
+
+                    if self.missing_required_items({code: data}):
+                        return None
+                    if len(data) * 2 < template['item_count']:
+                        return None
+                    statements[code] = data
+                    pages.append({
+                        'index': template['page_index'],
+                        'section': code,
+                        'text': "",
+                        'tables': [[[]] + rows],
+                        'layouts': [],
+                    })
         except Exception as e:
-            print(f"Error extracting tables from {pdf_path}: {e}")
+            print(f"  Warning: Layout template read failed for {pdf_path}: {e}")
             return None
-        return tables
+        return statements, pages
+
+    def update_layouts(self, pages, statements, location_code, statement_type):
+        """Learn layout templates from a full parse for next month's files"""
+        for code, data in statements.items():
+            template = None
+            if not self.missing_required_items({code: data}):
+                template = self.learn_layout(pages, code)
+            if template:
+                self.layouts.save(location_code, statement_type, code, template)
+            else:
+                self.layouts.discard(location_code, statement_type, code)
+
+    def match_statements(self, pages, statement_type):
+        """
+        Match each statement's line items against its own pages
+        Returns: dict of {statement code: {line_item: amount}}
+        """
+        sections = self.split_sections(pages, statement_type)
+        return {
+            code: self.extract_statement_data(text, tables, self.statement_items[code])
+            for code, (text, tables) in sections.items()
+        }
+
+    def match_periods(self, pages, statement_type, year, month):
+        """
+        Match statements laid out with one column per month
+        The months are only used when they include the file's own period
+        and that period has every required line item
+        Returns: dict of {(year, month): {statement code: {line_item: amount}}}
+        """
+        periods = {}
+        sections = self.split_sections(pages, statement_type)
+        for code, (text, tables) in sections.items():
+            by_period = self.extract_period_data(text, tables, self.statement_items[code], year, month)
+            for period, data in by_period.items():
+                periods.setdefault(period, {})[code] = data
+
+        if (year, month) not in periods or self.missing_required_items(periods[(year, month)]):
+            return {}
+        return periods
+
+    def merge_periods(self, statements, pages, statement_type, year, month):
+        """
+        Match month columns (trailing twelve months, YTD) and use the file's
+        own month for its statements
+        Returns: dict of {(year, month): {statement code: {line_item: amount}}}
+        """
+        periods = self.match_periods(pages, statement_type, year, month) if pages else {}
+        if periods:
+            for code, data in periods[(year, month)].items():
+                statements[code] = data
+        return periods
+
+    def period_results(self, periods, year, month):
+        """
+        Per-month statement data for every month besides the file's own
+        Returns: list of dicts (year, month, pnl_data, balance_sheet_data, cash_flow_data)
+        """
+        return [
+            {
+                'year': period_year,
+                'month': period_month,
+                'pnl_data': data.get('IS', {}),
+                'balance_sheet_data': data.get('BS', {}),
+                'cash_flow_data': data.get('CF', {}),
+            }
+            for (period_year, period_month), data in sorted(periods.items())
+            if (period_year, period_month) != (year, month)
+        ]
+
+    def rematch_archive(self, entries):
+        """
+        Match line items again over archived extractions, without reading PDFs
+        entries: iterable of (metadata, pages) from ExtractionArchive.entries()
+        Returns: list of result dicts like parse_pdf's, one per archive entry
+        """
+        results = []
+        for metadata, pages in entries:
+            year, month, statement_type = metadata['year'], metadata['month'], metadata['statement_type']
+
+            statements = self.match_statements(pages, statement_type)
+            periods = self.merge_periods(statements, pages, statement_type, year, month)
+            results.append({
+                'year': year,
+                'month': month,
+                'location_code': metadata['location_code'],
+                'statement_type': statement_type,
+                'file_name': metadata['file_name'],
+                'file_hash': metadata['file_hash'],
+                'archived_at': metadata['archived_at'],
+                'extraction_tier': metadata['tier'],
+                'pnl_data': statements.get('IS', {}),
+                'balance_sheet_data': statements.get('BS', {}),
+                'cash_flow_data': statements.get('CF', {}),
+                'periods': self.period_results(periods, year, month),
+            })
+        return results
+
+    def missing_required_items(self, statements):
+        """Return the required line items not found in the matched statements"""
+        return [
+            item
+            for code, data in statements.items()
+            for item in REQUIRED_LINE_ITEMS.get(code, [])
+            if item not in data
+        ]
 
     def parse_amount(self, amount_str):
         """
         Parse monetary amount from string
-        Handles formats like: $1,234.56, (1,234.56), -1,234.56
+        Handles formats like: $1,234.56, (1,234.56), $ (1,234.56), -1,234.56, 1,234.56-
+        and dash-only zeros (-, –, —)
         """
         if not amount_str or pd.isna(amount_str):
             return None
 
-        # Convert to string and clean
-        amount_str = str(amount_str).strip()
+        amount = parse_amount_text(amount_str)
+        return None if np.isnan(amount) else amount
+
+    def find_amount_columns(self, rows):
+        """
+        Parse the given table rows and pick their amount columns
+        A column is an amount column when at least half of its non-empty
+        cells parse as amounts. Columns of bare integers (account numbers)
+        are skipped when the rows have other amount columns
+        Returns: (2-D NumPy array of amounts, boolean array of amount columns)
+        """
+        width = max(len(row) for row in rows)
+        cells = np.array([list(row) + [None] * (width - len(row)) for row in rows], dtype=object)
+        flat = cells.ravel()
 
-        # Check for parentheses (negative number in accounting)
-        is_negative = False
-        if '(' in amount_str and ')' in amount_str:
-            is_negative = True
-            amount_str = amount_str.replace('(', '').replace(')', '')
+        amounts = parse_amount_series(flat).to_numpy().reshape(cells.shape)
+        text = [str(cell).strip() if cell is not None else '' for cell in flat]
+        non_empty = np.array([value != '' for value in text]).reshape(cells.shape)
+        bare_integer = np.array([value.isdigit() for value in text]).reshape(cells.shape)
 
-        # Remove currency symbols and commas
-        amount_str = re.sub(r'[$,\s]', '', amount_str)
+        parsed = ~np.isnan(amounts)
+        parsed_count = parsed.sum(axis=0)
+        amount_columns = (parsed_count > 0) & (parsed_count * 2 >= non_empty.sum(axis=0))
+        code_columns = amount_columns & ((bare_integer & parsed).sum(axis=0) == parsed_count)
+        if (amount_columns & ~code_columns).any():
+            amount_columns &= ~code_columns
 
-        # Try to convert to float
-        try:
-            amount = float(amount_str)
-            return -amount if is_negative else amount
-        except ValueError:
-            return None
+        return amounts, amount_columns
+
+    def extract_table_amounts(self, rows):
+        """
+        Pick the amount for each of the given table rows in one pass
+        Each row takes the first amount found in the amount columns, left
+        to right
+        Returns: NumPy array of row amounts (NaN where a row has none)
+        """
+        amounts, amount_columns = self.find_amount_columns(rows)
+        masked = np.where(amount_columns, amounts, np.nan)
+        first = (~np.isnan(masked)).argmax(axis=1)
+        return masked[np.arange(len(rows)), first]
 
     def extract_statement_data(self, text, tables, line_items):
         """
@@ -114,42 +825,135 @@ class FinancialStatementParser:
         Returns: dict of {line_item: amount}
         """
         data = {}
+        wanted = set(line_items)
+        matcher = self.matcher if wanted <= self.matcher.items else LineItemMatcher(line_items)
 
         # Method 1: Try to extract from tables first
         if tables:
             for table in tables:
-                df = pd.DataFrame(table[1:], columns=table[0] if table else None)
-                for _, row in df.iterrows():
-                    for line_item in line_items:
-                        # Check each cell for the line item name
-                        for cell in row:
-                            if cell and isinstance(cell, str):
-                                if line_item.lower() in cell.lower():
-                                    # Look for amount in the same row
-                                    for value in row:
-                                        amount = self.parse_amount(value)
-                                        if amount is not None:
-                                            data[line_item] = amount
-                                            break
-                                    break
-
-        # Method 2: Parse from text using regex
+                rows = table[1:]
+                row_hits = []
+                for i, row in enumerate(rows):
+                    hits = [item for item in matcher.find_in_row(row) if item in wanted]
+                    if hits:
+                        row_hits.append((i, hits))
+                if not row_hits:
+                    continue
+
+                # Use the amount from the same row (only line item rows are parsed)
+                row_amounts = self.extract_table_amounts([rows[i] for i, _ in row_hits])
+                for (_, hits), amount in zip(row_hits, row_amounts):
+                    if not np.isnan(amount):
+                        for line_item in hits:
+                            data[line_item] = float(amount)
+
+        # Method 2: Parse amounts from the text lines
         if not data and text:
             lines = text.split('\n')
-            for line in lines:
-                for line_item in line_items:
-                    # Look for line item followed by amount
-                    if line_item.lower() in line.lower():
-                        # Extract numbers from the line
-                        amounts = re.findall(r'[\$\(]?[\d,]+\.?\d*[\)]?', line)
-                        if amounts:
-                            # Take the last amount on the line (usually the total)
-                            amount = self.parse_amount(amounts[-1])
-                            if amount is not None:
-                                data[line_item] = amount
+            for i, line in enumerate(lines):
+                hits = [item for item in matcher.find(line) if item in wanted]
+                if not hits:
+                    continue
+                amounts = line_amounts(line)
+                if not amounts and i + 1 < len(lines):
+                    # Some extractors put each cell on its own line, so the
+                    # amount can be alone on the line after the label
+                    amount = self.parse_amount(lines[i + 1])
+                    if amount is not None:
+                        amounts = [amount]
+                if amounts:
+                    # Take the last amount on the line (usually the total)
+                    for line_item in hits:
+                        data[line_item] = amounts[-1]
 
         return data
 
+    def extract_period_data(self, text, tables, line_items, file_year, file_month):
+        """
+        Extract line items from multi-period statements (trailing twelve
+        months, year to date) that have one amount column per month
+        Columns such as Total or YTD are ignored
+        Returns: dict of {(year, month): {line_item: amount}} (empty when
+        the statement has no month columns)
+        """
+        periods = {}
+        wanted = set(line_items)
+        matcher = self.matcher if wanted <= self.matcher.items else LineItemMatcher(line_items)
+
+        # Method 1: tables with a month header row
+        for table in tables or []:
+            for header_index, header in enumerate(table[:3]):
+                columns = period_columns(header, file_year, file_month)
+                if columns:
+                    break
+            else:
+                continue
+
+            rows = table[header_index + 1:]
+            row_hits = []
+            for i, row in enumerate(rows):
+                hits = [item for item in matcher.find_in_row(row) if item in wanted]
+                if hits:
+                    row_hits.append((i, hits))
+            if not row_hits:
+                continue
+
+            for j, period in columns:
+                column = [rows[i][j] if j < len(rows[i]) else None for i, _ in row_hits]
+                for (_, hits), amount in zip(row_hits, parse_amount_series(column)):
+                    if not np.isnan(amount):
+                        for line_item in hits:
+                            periods.setdefault(period, {})[line_item] = float(amount)
+
+        # Method 2: text with a line (or run of lines) of month headers;
+        # most statements name at most one month, so check that first
+        if not periods and text and len({token.lower() for token in PERIOD_TOKEN_PATTERN.findall(text)}) >= 2:
+            lines = text.split('\n')
+            columns = []
+            header_run = []
+            for i, line in enumerate(lines):
+                # Extractors that emit one cell per line give one header per line
+                period = parse_period_header(line, file_year, file_month)
+                if period:
+                    header_run.append(period)
+                    if len(header_run) >= 2 and len(set(header_run)) == len(header_run):
+                        columns = list(header_run)
+                    continue
+                header_run = []
+
+                tokens = [
+                    parse_period_header(token, file_year, file_month)
+                    for token in PERIOD_TOKEN_PATTERN.findall(line)
+                ]
+                # Titles like "Jan 2025 - Dec 2025" have other words around the months
+                rest = PERIOD_HEADER_WORDS_PATTERN.sub('', PERIOD_TOKEN_PATTERN.sub('', line))
+                if len(tokens) >= 2 and len(set(tokens)) == len(tokens) and not re.search(r"[^\W_]", rest):
+                    columns = tokens
+                    continue
+
+                if not columns:
+                    continue
+                hits = [item for item in matcher.find(line) if item in wanted]
+                if not hits:
+                    continue
+
+                amounts = line_amounts(line)
+                if not amounts:
+                    # Amounts on the following lines, one per line
+                    for next_line in lines[i + 1:i + 1 + len(columns)]:
+                        amount = self.parse_amount(next_line)
+                        if amount is None:
+                            break
+                        amounts.append(amount)
+                if len(amounts) < len(columns):
+                    continue
+
+                for period, amount in zip(columns, amounts):
+                    for line_item in hits:
+                        periods.setdefault(period, {})[line_item] = amount
+
+        return periods
+
     def extract_pnl_data(self, text, tables=None):
         """Extract P&L/Income Statement data"""
         return self.extract_statement_data(text, tables, self.pnl_items)
@@ -181,35 +985,139 @@ class FinancialStatementParser:
         print(f"  Period: {year}-{month:02d}")
         print(f"  Statement Type: {statement_type}")
 
-        # Extract text and tables
-        text = self.extract_text_from_pdf(pdf_path)
-        tables = self.extract_tables_from_pdf(pdf_path)
+        return self.parse_statements(pdf_path, year, month, location_code, statement_type)
 
-        if not text and not tables:
-            print(f"  Error: Could not extract any data from PDF")
-            return None
+    def parse_location_pages(self, pdf_path, year, month, location_code, page_numbers, file_hash=None):
+        """
+        Parse one location's pages of a consolidated packet
+        Only those pages are opened, so memory stays bounded by the largest
+        location rather than the whole packet
+        Returns: dict with metadata and all extracted statement data or None if failed
+        """
+        pdf_path = Path(pdf_path)
+
+        print(f"Processing: {pdf_path.name} (pages {page_numbers[0] + 1}-{page_numbers[-1] + 1})")
+        print(f"  Location: {LOCATIONS[location_code]['name']}")
+        print(f"  Period: {year}-{month:02d}")
+
+        return self.parse_statements(pdf_path, year, month, location_code, 'ALL', file_hash, page_numbers)
+
+    def parse_statements(self, pdf_path, year, month, location_code, statement_type, file_hash=None, page_numbers=None):
+        """
+        Extract every statement in a PDF (or in page_numbers of it)
+        The result's 'stats' hold the page count, tables found, items
+        matched, bytes read and seconds spent in each of PARSE_STAGES
+        Returns: dict with metadata and all extracted statement data or None if failed
+        """
+        self.stage_times = Counter()
+        self.page_count = 0
+
+        if file_hash is None:
+            with self.timed('hash'):
+                file_hash = file_sha256(pdf_path)
+
+        # Reuse the cached result if this exact file was parsed before
+        config_hash = self.config_hash(statement_type, page_numbers)
+        if self.cache:
+            cached = self.cache.get(file_hash, config_hash)
+            if cached:
+                print(f"  Using cached parse (file unchanged)")
+                # Metadata comes from the current filename, not the cached one
+                cached.update({
+                    'year': year,
+                    'month': month,
+                    'location_code': location_code,
+                    'file_name': pdf_path.name,
+                    'stats': dict(
+                        cached.get('stats', {}),
+                        cached=True,
+                        stage_seconds={stage: round(self.stage_times[stage], 4) for stage in PARSE_STAGES},
+                    ),
+                })
+                return cached
+
+        # Tier 1: cheap text-only pass; tier 2: learned layout templates;
+        # tier 3: pdfplumber text and full table detection
+        statements = None
+        tier = None
+        pages = []
+        if self.tiered:
+            pages = self.extract_fast_text(pdf_path, statement_type, page_numbers)
+            if pages:
+                with self.timed('matching'):
+                    statements = self.match_statements(pages, statement_type)
+                missing = self.missing_required_items(statements)
+                if missing:
+                    print(f"  Fast text pass missing: {', '.join(missing)}")
+                    statements = None
+                else:
+                    tier = 'text'
+
+        if statements is None and self.layouts:
+            templates = self.layouts.get(location_code, statement_type)
+            codes = STATEMENT_CODES if statement_type == 'ALL' else [statement_type]
+            if all(code in templates for code in codes):
+                extracted = self.extract_with_layouts(pdf_path, templates, statement_type, page_numbers)
+                if extracted is None:
+                    print(f"  Layout template checks failed; running full table detection")
+                else:
+                    statements, pages = extracted
+                    tier = 'template'
+
+        if statements is None:
+            pages = self.extract_pdf_content(pdf_path, statement_type, page_numbers)
+
+            if not pages or not any(page['text'].strip() or page['tables'] for page in pages):
+                print(f"  Error: Could not extract any data from PDF")
+                return None
+
+            with self.timed('matching'):
+                statements = self.match_statements(pages, statement_type)
+            tier = 'tables'
+
+        with self.timed('matching'):
+            periods = self.merge_periods(statements, pages, statement_type, year, month)
+
+        if tier == 'tables' and self.layouts and not periods:
+            self.update_layouts(pages, statements, location_code, statement_type)
+
+        # Keep the raw extraction so line item changes can be re-matched later
+        if self.archive:
+            with self.timed('archive'):
+                self.archive.put(file_hash, {
+                    'file_name': pdf_path.name,
+                    'location_code': location_code,
+                    'year': year,
+                    'month': month,
+                    'statement_type': statement_type,
+                    'tier': tier,
+                }, pages, page_numbers)
+
+        print(f"  Extraction tier: {tier}")
+        found = [code for code in STATEMENT_CODES if any(page['section'] == code for page in pages)]
+        if statement_type == 'ALL' and found:
+            print(f"  Sections found: {', '.join(found)}")
+        if periods:
+            print(f"  Periods found: {len(periods)} ({min(periods)[0]}-{min(periods)[1]:02d} to {max(periods)[0]}-{max(periods)[1]:02d})")
 
         # Extract data based on statement type
-        pnl_data = {}
-        balance_sheet_data = {}
-        cash_flow_data = {}
+        pnl_data = statements.get('IS', {})
+        balance_sheet_data = statements.get('BS', {})
+        cash_flow_data = statements.get('CF', {})
 
         if statement_type in ['ALL', 'IS']:
-            pnl_data = self.extract_pnl_data(text, tables)
             if pnl_data:
                 print(f"  Extracted {len(pnl_data)} P&L line items")
             else:
                 print(f"  Warning: No P&L line items found.")
 
         if statement_type in ['ALL', 'BS']:
-            balance_sheet_data = self.extract_balance_sheet_data(text, tables)
             if balance_sheet_data:
                 print(f"  Extracted {len(balance_sheet_data)} Balance Sheet line items")
             else:
                 print(f"  Warning: No Balance Sheet line items found.")
 
         if statement_type in ['ALL', 'CF']:
-            cash_flow_data = self.extract_cash_flow_data(text, tables)
             if cash_flow_data:
                 print(f"  Extracted {len(cash_flow_data)} Cash Flow line items")
             else:
@@ -221,11 +1129,18 @@ class FinancialStatementParser:
             'location_code': location_code,
             'statement_type': statement_type,
             'file_name': pdf_path.name,
+            'file_hash': file_hash,
+            'extraction_tier': tier,
             'pnl_data': pnl_data,
             'balance_sheet_data': balance_sheet_data,
-            'cash_flow_data': cash_flow_data
+            'cash_flow_data': cash_flow_data,
+            'periods': self.period_results(periods, year, month),
+            'stats': self.parse_stats(pdf_path, pages, statements),
         }
 
+        if self.cache:
+            self.cache.put(file_hash, config_hash, result)
+
         return result
 
 
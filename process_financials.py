@@ -2,55 +2,248 @@
 Process financial statements and load into database
 """
 
-import sys
+import time
+import argparse
 from pathlib import Path
-from database import FinancialDatabase
+from collections import Counter
+from contextlib import nullcontext
+import pandas as pd
+from database import FinancialDatabase, LINE_ITEM_TABLES
 from pdf_parser import FinancialStatementParser, load_from_csv
+from parse_cache import file_sha256
+from extraction_archive import ExtractionArchive
+from parse_workers import run_isolated, Quarantine
+from timing_log import TimingLog
 from config import FINANCIALS_DIR
 
+# Per-file stage timings for every file processed (shared by all threads)
+timing_log = TimingLog()
 
-def process_pdf(pdf_path, db):
-    """Process a single PDF file"""
+
+def parse_pdf_file(pdf_path):
+    """Parse a single PDF (runs in a worker process when --jobs > 1)"""
+    parser = FinancialStatementParser()
+    return parser.parse_pdf(pdf_path)
+
+
+def find_location_pages(pdf_path):
+    """Split a consolidated packet into location page ranges (runs in a worker process)"""
+    parser = FinancialStatementParser()
+    return parser.find_location_pages(pdf_path)
+
+
+def parse_location_pages(pdf_path, year, month, location_code, page_numbers, file_hash):
+    """Parse one location's pages of a consolidated packet (runs in a worker process)"""
     parser = FinancialStatementParser()
+    return parser.parse_location_pages(pdf_path, year, month, location_code, page_numbers, file_hash)
+
+
+def parse_pdfs(pdf_files, jobs=1, quarantine=None):
+    """
+    Parse PDFs in isolated worker processes, up to jobs at a time
+    Quarantined files are skipped. Files that time out, exceed the memory
+    limit or crash the parser are quarantined so the rest keep going.
+    Yields: (pdf_file, result or None) for each file as it finishes
+    """
+    quarantine = quarantine or Quarantine()
+    tasks = []
+    for pdf_file in pdf_files:
+        entry = quarantine.get(pdf_file)
+        if entry:
+            print(f"Skipping quarantined file {Path(pdf_file).name}: {entry['reason']}")
+            timing_log.record(Path(pdf_file).name, status='quarantined')
+            yield pdf_file, None
+        else:
+            tasks.append((pdf_file, parse_pdf_file, (pdf_file,)))
+
+    for pdf_file, result, error in run_isolated(tasks, jobs):
+        if error:
+            quarantine.add(pdf_file, error)
+        if not result:
+            timing_log.record(Path(pdf_file).name, status='parse failed')
+        yield pdf_file, result
+
+
+def process_pdf(pdf_path, db, tiers=None, jobs=1, db_lock=None):
+    """
+    Process a single PDF file
+    Parsing runs in an isolated worker process; database writes stay in
+    this process and hold db_lock (if given) while loading
+    If a Counter is passed as tiers, the extraction tier used is counted
+    Consolidated packets (YYYY-MM_CONSOLIDATED.pdf) are split by location
+    and parsed with up to jobs worker processes
+    """
+    if FinancialStatementParser().parse_consolidated_filename(Path(pdf_path).name):
+        return process_consolidated_pdf(pdf_path, db, jobs, tiers, db_lock)
 
     # Parse the PDF
-    result = parser.parse_pdf(pdf_path)
+    _, result = next(parse_pdfs([pdf_path]))
 
     if not result:
         print(f"Failed to process {pdf_path}")
         return False
 
-    # Add to database
-    statement_id = db.add_financial_statement(
-        location_code=result['location_code'],
-        year=result['year'],
-        month=result['month'],
-        file_name=result['file_name']
-    )
-
-    if not statement_id:
-        print(f"Failed to add statement to database")
+    if tiers is not None:
+        tiers[result.get('extraction_tier')] += 1
+
+    with db_lock or nullcontext():
+        return load_pdf_result(result, db)
+
+
+def load_pdf_result(result, db):
+    """
+    Load a parsed PDF result into the database
+    Multi-period results (trailing twelve months, YTD) load every month in
+    one transaction, so a failed load leaves none of them behind. Months
+    already in the database from another file are left as they are.
+    Re-sending a file is a no-op when it is unchanged; when it was restated
+    only the amounts that differ are upserted and line items it no longer
+    has are deleted.
+    The file's stage timings are appended to the timing log.
+    """
+    start = time.perf_counter()
+    try:
+        with db.transaction():
+            loaded = load_result_periods(result, db)
+    except Exception as e:
+        print(f"Error loading {result['file_name']}: {e}")
+        timing_log.record(result['file_name'], result, time.perf_counter() - start, status='load failed')
         return False
+    timing_log.record(result['file_name'], result, time.perf_counter() - start)
+
+    if result.get('periods'):
+        print(f"  Loaded {loaded} periods")
+    print(f"✓ Successfully processed {result['file_name']}")
+    return True
+
 
-    # Add P&L data (Income Statement)
-    if result['pnl_data']:
-        for line_item, amount in result['pnl_data'].items():
-            db.add_pnl_data(statement_id, line_item, amount)
+def load_result_periods(result, db):
+    """
+    Load every period of a parsed result (call inside db.transaction())
+    Raises if a period cannot be added
+    Returns: number of periods loaded
+    """
+    if not load_statement(db, result['location_code'], result['year'], result['month'],
+                          result['file_name'], result, result.get('file_hash')):
+        raise RuntimeError(f"Failed to add {result['location_code']} {result['year']}-{result['month']:02d} to database")
+
+    loaded = 1
+    for period in result.get('periods', []):
+        loaded_from = db.get_statement_files(result['location_code'], period['year'], period['month'])
+        loaded_from.discard(result['file_name'])
+        if loaded_from:
+            print(f"  Skipping {period['year']}-{period['month']:02d}: already loaded from {', '.join(sorted(loaded_from))}")
+            continue
+        if not load_statement(db, result['location_code'], period['year'], period['month'],
+                              result['file_name'], period, result.get('file_hash')):
+            raise RuntimeError(f"Failed to add {result['location_code']} {period['year']}-{period['month']:02d} to database")
+        loaded += 1
+    return loaded
+
+
+def parse_consolidated_pdf(pdf_path, jobs=1):
+    """
+    Parse a consolidated packet with every location's statements
+    Location page ranges are found from page headers and parsed in isolated
+    worker processes (in parallel when jobs > 1)
+    Returns: (list of location results, list of location codes that failed)
+    or None if the packet could not be split
+    """
+    pdf_path = Path(pdf_path)
+    parser = FinancialStatementParser()
+    year, month = parser.parse_consolidated_filename(pdf_path.name)
+    quarantine = Quarantine()
+
+    print(f"Processing consolidated packet: {pdf_path.name}")
+    entry = quarantine.get(pdf_path)
+    if entry:
+        print(f"Skipping quarantined file {pdf_path.name}: {entry['reason']}")
+        timing_log.record(pdf_path.name, status='quarantined')
+        return None
+
+    for _, location_pages, error in run_isolated([(pdf_path, find_location_pages, (pdf_path,))]):
+        if error:
+            quarantine.add(pdf_path, error)
+            return None
+    if not location_pages:
+        print(f"  Error: No location headers found in {pdf_path.name}")
+        return None
+    print(f"  Locations found: {len(location_pages)} ({', '.join(location_pages)})")
+
+    file_hash = file_sha256(pdf_path)
+    tasks = [
+        (location_code, parse_location_pages, (pdf_path, year, month, location_code, page_numbers, file_hash))
+        for location_code, page_numbers in location_pages.items()
+    ]
+    results = []
+    failed = []
+    for location_code, result, error in run_isolated(tasks, jobs):
+        if error:
+            # The other locations still load; the packet is retried once it changes
+            page_numbers = location_pages[location_code]
+            quarantine.add(pdf_path, f"{location_code} pages {page_numbers[0] + 1}-{page_numbers[-1] + 1}: {error}")
+        if result:
+            results.append(result)
+        else:
+            timing_log.record(pdf_path.name, status='parse failed', location_code=location_code)
+            failed.append(location_code)
+
+    if failed:
+        print(f"  Failed to parse: {', '.join(sorted(failed))}")
+    return results, failed
+
+
+def process_consolidated_pdf(pdf_path, db, jobs=1, tiers=None, db_lock=None):
+    """
+    Process a consolidated packet with every location's statements
+    All locations that parsed are loaded in one transaction
+    Returns: True if every location in the packet was loaded
+    """
+    pdf_path = Path(pdf_path)
+    parsed = parse_consolidated_pdf(pdf_path, jobs)
+    if parsed is None:
+        return False
+    results, failed = parsed
+
+    if tiers is not None:
+        for result in results:
+            tiers[result.get('extraction_tier')] += 1
+
+    # All locations in one batch
+    load_seconds = {}
+    try:
+        with db_lock or nullcontext(), db.transaction():
+            for result in sorted(results, key=lambda result: result['location_code']):
+                start = time.perf_counter()
+                load_result_periods(result, db)
+                load_seconds[result['location_code']] = time.perf_counter() - start
+    except Exception as e:
+        print(f"Error loading {pdf_path.name}: {e}")
+        for result in results:
+            timing_log.record(pdf_path.name, result, status='load failed')
+        return False
 
-    # Add Balance Sheet data
-    if result['balance_sheet_data']:
-        for line_item, amount in result['balance_sheet_data'].items():
-            db.add_balance_sheet_data(statement_id, line_item, amount)
+    for result in results:
+        timing_log.record(pdf_path.name, result, load_seconds[result['location_code']])
 
-    # Add Cash Flow data
-    if result['cash_flow_data']:
-        for line_item, amount in result['cash_flow_data'].items():
-            db.add_cash_flow_data(statement_id, line_item, amount)
+    print(f"✓ Successfully processed {len(results)} locations from {pdf_path.name}")
+    return not failed
 
-    # Mark as processed
-    db.mark_statement_processed(statement_id)
 
-    print(f"✓ Successfully processed {result['file_name']}")
+def load_statement(db, location_code, year, month, file_name, data, file_hash=None):
+    """
+    Load one period's statements (one batch per line item table) and mark it processed
+    Returns: True if loaded, unchanged or restated; False if failed
+    """
+    loaded = db.add_statement_data(location_code, year, month, file_name, data, file_hash)
+    if loaded is None:
+        return False
+
+    _, status, written = loaded
+    if status == 'unchanged':
+        print(f"  {year}-{month:02d}: unchanged (identical file already loaded)")
+    elif status == 'restated':
+        print(f"  {year}-{month:02d}: restated, {written} line items changed")
     return True
 
 
@@ -63,31 +256,47 @@ def process_csv(csv_path, db):
         return False
 
     # Add to database
-    statement_id = db.add_financial_statement(
-        location_code=result['location_code'],
-        year=result['year'],
-        month=result['month'],
-        file_name=result['file_name']
-    )
-
-    if not statement_id:
+    if not load_statement(db, result['location_code'], result['year'], result['month'],
+                          result['file_name'], result, file_sha256(csv_path)):
         print(f"Failed to add statement to database")
         return False
 
-    # Add P&L data
-    for line_item, amount in result['pnl_data'].items():
-        db.add_pnl_data(statement_id, line_item, amount)
-
-    # Mark as processed
-    db.mark_statement_processed(statement_id)
-
     print(f"✓ Successfully processed {result['file_name']}")
     return True
 
 
-def process_all_financials():
-    """Process all financial statements in the financials directory"""
+def process_pdfs(pdf_files, db, jobs, total_files, tiers):
+    """
+    Parse PDFs in isolated worker processes, up to jobs at a time
+    Database writes stay in this process, so there is a single writer
+    Returns: (processed, failed)
+    """
+    processed = 0
+    failed = 0
+
+    for pdf_file, result in parse_pdfs(pdf_files, jobs):
+        print(f"\n[{processed + failed + 1}/{total_files}] {pdf_file.name}")
+        if not result:
+            print(f"Failed to process {pdf_file}")
+            failed += 1
+            continue
+
+        tiers[result.get('extraction_tier')] += 1
+        if load_pdf_result(result, db):
+            processed += 1
+        else:
+            failed += 1
+
+    return processed, failed
+
+
+def process_all_financials(jobs=1, bulk=False):
+    """
+    Process all financial statements in the financials directory
+    With bulk=True every file is parsed first and loaded in one batch
+    """
     db = FinancialDatabase()
+    start_time = time.perf_counter()
 
     print("=" * 60)
     print("Processing Financial Statements")
@@ -105,22 +314,38 @@ def process_all_financials():
     total_files = len(pdf_files) + len(csv_files)
     processed = 0
     failed = 0
+    tiers = Counter()
 
-    # Process PDFs
-    for pdf_file in pdf_files:
-        print(f"\n[{processed + failed + 1}/{total_files}]")
-        if process_pdf(pdf_file, db):
-            processed += 1
-        else:
-            failed += 1
+    # Consolidated packets are split by location and use the workers themselves
+    parser = FinancialStatementParser()
+    consolidated_files = [pdf_file for pdf_file in pdf_files if parser.parse_consolidated_filename(pdf_file.name)]
+    pdf_files = [pdf_file for pdf_file in pdf_files if pdf_file not in consolidated_files]
 
-    # Process CSVs
-    for csv_file in csv_files:
-        print(f"\n[{processed + failed + 1}/{total_files}]")
-        if process_csv(csv_file, db):
-            processed += 1
-        else:
-            failed += 1
+    if bulk:
+        processed, failed = bulk_load_financials(pdf_files, csv_files, consolidated_files, db, jobs, tiers)
+    else:
+        # Process PDFs (each parsed in an isolated worker process)
+        if pdf_files:
+            if jobs > 1:
+                print(f"\nParsing {len(pdf_files)} PDFs with {jobs} worker processes")
+            processed, failed = process_pdfs(pdf_files, db, jobs, total_files, tiers)
+
+        for pdf_file in consolidated_files:
+            print(f"\n[{processed + failed + 1}/{total_files}]")
+            if process_pdf(pdf_file, db, tiers, jobs):
+                processed += 1
+            else:
+                failed += 1
+
+        # Process CSVs
+        for csv_file in csv_files:
+            print(f"\n[{processed + failed + 1}/{total_files}]")
+            if process_csv(csv_file, db):
+                processed += 1
+            else:
+                failed += 1
+
+    elapsed = time.perf_counter() - start_time
 
     # Summary
     print("\n" + "=" * 60)
@@ -128,6 +353,10 @@ def process_all_financials():
     print(f"  Processed: {processed}")
     print(f"  Failed: {failed}")
     print(f"  Total: {total_files}")
+    print(f"  Time: {elapsed:.1f}s ({total_files / elapsed:.2f} files/sec)")
+    if tiers:
+        # How often the fast text pass was enough vs. full table extraction
+        print(f"  Extraction tiers: " + ", ".join(f"{tier} {count}" for tier, count in sorted(tiers.items())))
     print("=" * 60)
 
     # Show database stats
@@ -138,23 +367,194 @@ def process_all_financials():
         print(f"  Total statements: {stats['total_statements'].iloc[0]}")
         print(f"  Date range: {stats['earliest_date'].iloc[0]} to {stats['latest_date'].iloc[0]}")
 
+    # Hand the new data to the dashboard
+    db.publish_snapshot()
     db.close()
 
 
+def result_rows(results, order):
+    """
+    Flatten parse results into one row per statement and one per line item
+    (every result's rows, including several results for the same month)
+    Returns: (statements DataFrame, amounts DataFrame)
+    """
+    statement_rows = []
+    amount_rows = []
+    for result in results:
+        source = (result['file_name'], result.get('file_hash'))
+        for period, own_period in [(result, True)] + [(period, False) for period in result.get('periods', [])]:
+            key = (result['location_code'], period['year'], period['month'])
+            statement_rows.append(key + source + (own_period, order(result)))
+            # Result keys are named after their tables
+            for table in LINE_ITEM_TABLES:
+                for line_item, amount in period.get(table, {}).items():
+                    amount_rows.append((table,) + key + (line_item, amount) + source + (own_period, order(result)))
+
+    statements = pd.DataFrame(statement_rows, columns=['location_code', 'year', 'month', 'file_name',
+                                                       'file_hash', 'own_period', 'order'])
+    amounts = pd.DataFrame(amount_rows, columns=['table_name', 'location_code', 'year', 'month', 'line_item',
+                                                 'amount', 'file_name', 'file_hash', 'own_period', 'order'])
+    return statements, amounts
+
+
+def bulk_load_financials(pdf_files, csv_files, consolidated_files, db, jobs, tiers):
+    """
+    Parse every file, then load them all through staging tables with one
+    set-based upsert per table (for multi-year backfills)
+    When two files supply the same statement of a month, the later file
+    name wins; separate IS/BS/CF files each load their own statement
+    Returns: (processed, failed) file counts
+    """
+    results = []
+    processed = 0
+    failed = 0
+
+    if pdf_files:
+        print(f"\nParsing {len(pdf_files)} PDFs with {jobs} worker process{'es' if jobs > 1 else ''}")
+    for pdf_file, result in parse_pdfs(pdf_files, jobs):
+        if result:
+            results.append(result)
+            processed += 1
+        else:
+            print(f"Failed to process {pdf_file}")
+            failed += 1
+
+    for pdf_file in consolidated_files:
+        parsed = parse_consolidated_pdf(pdf_file, jobs)
+        if parsed is None:
+            failed += 1
+            continue
+        location_results, failed_locations = parsed
+        results.extend(location_results)
+        if failed_locations:
+            failed += 1
+        else:
+            processed += 1
+
+    for csv_file in csv_files:
+        result = load_from_csv(csv_file)
+        if result:
+            result['file_hash'] = file_sha256(csv_file)
+            results.append(result)
+            processed += 1
+        else:
+            print(f"Failed to process {csv_file}")
+            failed += 1
+
+    # Manual CSV entries have no extraction tier
+    for result in results:
+        if result.get('extraction_tier'):
+            tiers[result['extraction_tier']] += 1
+    if not results:
+        return processed, failed
+
+    statements, amounts = result_rows(results, lambda result: result['file_name'])
+    print(f"\nBulk loading {len(statements)} statements ({len(amounts)} line items) from {len(results)} results")
+
+    start = time.perf_counter()
+    try:
+        counts = db.bulk_load(statements, amounts)
+    except Exception as e:
+        print(f"Error bulk loading: {e}")
+        for result in results:
+            timing_log.record(result['file_name'], result, status='load failed')
+        return 0, processed + failed
+    # One load for everything, so each result gets an equal share
+    load_seconds = (time.perf_counter() - start) / len(results)
+
+    for result in results:
+        timing_log.record(result['file_name'], result, load_seconds)
+
+    print(f"  Time: {time.perf_counter() - start:.2f}s")
+    print(f"  Unchanged (identical file already loaded): {counts['unchanged']} statements")
+    if counts['deleted']:
+        print(f"  Line items no longer in their restated file: {counts['deleted']} deleted")
+    for table, label in [('financial_statements', 'Statements'), ('pnl_data', 'P&L'),
+                         ('balance_sheet_data', 'Balance Sheet'), ('cash_flow_data', 'Cash Flow')]:
+        inserted, updated = counts[table]
+        print(f"  {label}: {inserted} inserted, {updated} updated")
+    return processed, failed
+
+
+def rematch_financials():
+    """
+    Match line items again over the extraction archive and bulk-upsert the
+    amounts that changed. No PDFs are read, so after a line item config
+    change all history is reprocessed in seconds. Statements are only
+    updated from the file they were loaded from, so manual CSV entries
+    and months loaded from another file are left as they are.
+    """
+    start_time = time.perf_counter()
+
+    print("=" * 60)
+    print("Re-matching Archived Extractions")
+    print("=" * 60)
+
+    parser = FinancialStatementParser(use_cache=False, use_layouts=False, use_archive=False)
+    results = parser.rematch_archive(ExtractionArchive().entries())
+    if not results:
+        print("\nNo archived extractions found. Process PDFs first.")
+        return
+
+    # Every archived file's amounts; the database keeps those matching the
+    # file each statement was loaded from, newest archive first
+    _, amounts = result_rows(results, lambda result: result['archived_at'])
+
+    db = FinancialDatabase()
+    try:
+        counts = db.upsert_changed_amounts(amounts)
+    except Exception as e:
+        print(f"Error updating amounts: {e}")
+        db.close()
+        return
+    db.publish_snapshot()
+    db.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n  Archived files: {len(results)}")
+    print(f"  Line items matched: {len(amounts)}")
+    for table, label in [('pnl_data', 'P&L'), ('balance_sheet_data', 'Balance Sheet'), ('cash_flow_data', 'Cash Flow')]:
+        inserted, updated = counts[table]
+        print(f"  {label}: {inserted} new, {updated} changed")
+    print(f"  Time: {elapsed:.1f}s")
+    print("=" * 60)
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1 (got {value})")
+    return number
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    arg_parser = argparse.ArgumentParser(description="Process financial statements into the database")
+    arg_parser.add_argument("file", nargs="?", help="Process a single .pdf or .csv file")
+    arg_parser.add_argument("-j", "--jobs", type=positive_int, default=1,
+                            help="Number of worker processes for parsing PDFs (default: 1)")
+    arg_parser.add_argument("--rematch", action="store_true",
+                            help="Re-match line items over archived extractions without reading PDFs")
+    arg_parser.add_argument("--bulk", action="store_true",
+                            help="Parse every file, then load them all in one batch (for backfills)")
+    args = arg_parser.parse_args()
+
+    if args.rematch:
+        rematch_financials()
+    elif args.file:
         # Process specific file
-        file_path = Path(sys.argv[1])
+        file_path = Path(args.file)
         db = FinancialDatabase()
 
         if file_path.suffix == '.pdf':
-            process_pdf(file_path, db)
+            process_pdf(file_path, db, jobs=args.jobs)
         elif file_path.suffix == '.csv':
             process_csv(file_path, db)
         else:
             print("Unsupported file type. Use .pdf or .csv")
 
+        db.publish_snapshot()
         db.close()
     else:
         # Process all files in financials directory
-        process_all_financials()
+        process_all_financials(jobs=args.jobs, bulk=args.bulk)
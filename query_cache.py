@@ -0,0 +1,97 @@
+"""
+In-memory cache of dashboard query results
+Results are keyed by the query text and parameters and tagged with the
+database's data version. Ingestion bumps the version whenever statements
+change, so a cache that sees a new version drops everything it holds.
+"""
+
+import threading
+from collections import OrderedDict
+from config import QUERY_CACHE_MAX_MB
+
+
+class QueryCache:
+    """
+    Holds query results as Arrow tables with size-based LRU eviction
+    The pandas form of a result is built the first time it is asked for
+    and kept beside the table, so repeat DataFrame hits are a cheap copy
+    """
+
+    def __init__(self, max_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> [pyarrow Table, DataFrame or None, bytes]
+        self.version = None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version):
+        """Drop every entry if the data version changed (caller holds the lock)"""
+        if version != self.version:
+            self.entries.clear()
+            self.total_bytes = 0
+            self.version = version
+
+    def _evict(self):
+        """Drop least recently used entries while over the size limit (caller holds the lock)"""
+        while self.total_bytes > self.max_bytes:
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted
+
+    def get(self, key, version, arrow=False):
+        """
+        Look up a result for the current data version
+        arrow: return the pyarrow Table instead of a DataFrame
+        Returns: the cached Table (immutable, so shared), a copy of the
+        cached DataFrame, or None
+        """
+        with self.lock:
+            self._check_version(version)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            if arrow:
+                return entry[0]
+            if entry[1] is None:
+                entry[1] = entry[0].to_pandas()
+                size = int(entry[1].memory_usage(deep=True).sum())
+                entry[2] += size
+                self.total_bytes += size
+            df = entry[1].copy()
+            self._evict()
+            return df
+
+    def put(self, key, version, table, df=None):
+        """
+        Store a result, then evict least recently used entries if over the size limit
+        df: the result already converted to pandas, if the caller has it
+        """
+        size = table.nbytes
+        if df is not None:
+            size += int(df.memory_usage(deep=True).sum())
+            df = df.copy()
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            self._check_version(version)
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[2]
+            self.entries[key] = [table, df, size]
+            self.total_bytes += size
+            self._evict()
+
+    def stats(self):
+        """Return (entry count, total bytes, hits, misses)"""
+        with self.lock:
+            return len(self.entries), self.total_bytes, self.hits, self.misses
+
+    def clear(self):
+        """Remove every cache entry"""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
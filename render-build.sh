@@ -12,9 +12,12 @@ pip install --upgrade pip setuptools wheel
 # Install dependencies
 pip install -r requirements.txt
 
-# Initialize database
+# Initialize database (and publish the dashboard snapshot)
 python database.py
 
+# Create the default users now rather than in the dashboard processes
+python auth.py
+
 echo "========================================="
 echo "Build complete!"
 echo "========================================="
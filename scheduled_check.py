@@ -3,8 +3,9 @@ Scheduled weekly check for missing financial statements
 Run this weekly to identify which locations haven't submitted statements
 """
 
+import sys
 from datetime import datetime, timedelta
-from database import FinancialDatabase
+from database import SnapshotReader, latest_snapshot
 from config import LOCATIONS
 import pandas as pd
 
@@ -15,17 +16,25 @@ def check_missing_statements(months_back=3):
     Args:
         months_back: How many months to check (default: 3)
     """
-    db = FinancialDatabase()
+    # Read the published snapshot so the check never blocks ingestion;
+    # without one every location would be reported missing
+    snapshot = latest_snapshot()
+    if snapshot is None:
+        print("✗ No database snapshot published yet. Process the statements or run "
+              "'python database.py publish' first.")
+        sys.exit(1)
+    db = SnapshotReader()
 
     print("=" * 80)
     print("Mason's Famous Lobsters - Missing Statements Report")
     print("=" * 80)
     print(f"Checking last {months_back} months")
     print(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Data as of: {snapshot['published_at']} (last published snapshot)")
     print("=" * 80)
 
-    # Get all data
-    all_data = db.get_all_data()
+    # Only the periods loaded per location are needed, not the P&L columns
+    all_data = db.get_all_data(line_items=[])
 
     # Generate expected months
     today = datetime.now()
@@ -104,8 +113,6 @@ def check_missing_statements(months_back=3):
 
 
 if __name__ == "__main__":
-    import sys
-
     months = 3
     if len(sys.argv) > 1:
         months = int(sys.argv[1])
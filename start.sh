@@ -1,3 +1,5 @@
 #!/bin/bash
-# Start the Panel dashboard
-exec panel serve dashboard.py --address 0.0.0.0 --port ${PORT:-5000} --allow-websocket-origin=*
+# Start the Panel dashboard (DASHBOARD_PROCS worker processes, default 1)
+# Create the default users first so workers never race to write them
+python auth.py
+exec panel serve dashboard.py --address 0.0.0.0 --port ${PORT:-5000} --allow-websocket-origin=* --num-procs=${DASHBOARD_PROCS:-1}
@@ -4,16 +4,18 @@
 echo "Starting Mason's Famous Lobsters P&L Dashboard..."
 echo "=================================================="
 
-# Initialize database
+# Initialize database, publish the dashboard snapshot and create the
+# default users, so dashboard workers only read at startup
 echo "Initializing database..."
 python database.py
+python auth.py
 
-# Start dashboard
-echo "Starting dashboard on port ${PORT:-5000}..."
+# Start dashboard (DASHBOARD_PROCS worker processes, default 1)
+echo "Starting dashboard on port ${PORT:-5000} with ${DASHBOARD_PROCS:-1} worker process(es)..."
 panel serve dashboard.py \
   --address 0.0.0.0 \
   --port ${PORT:-5000} \
   --allow-websocket-origin=* \
-  --num-procs=1
+  --num-procs=${DASHBOARD_PROCS:-1}
 
 echo "Dashboard is running!"
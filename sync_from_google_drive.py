@@ -170,6 +170,7 @@ def sync_from_google_drive():
             else:
                 failed += 1
 
+        db.publish_snapshot()
         db.close()
 
         print("\n" + "=" * 70)
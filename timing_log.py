@@ -0,0 +1,133 @@
+"""
+Per-file ingestion timing log
+Each processed PDF (or location of a consolidated packet) appends one JSON
+line with the seconds spent in each stage (hashing, opening, text, table
+detection, matching and the database load) plus page count, tables found,
+items matched and bytes read. Run this module for a summary with stage
+percentiles and the slowest files.
+
+Usage:
+    python timing_log.py                     # summary of every record
+    python timing_log.py --since 2026-02-01 --slowest 20
+"""
+
+import json
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from pdf_parser import PARSE_STAGES
+from config import INGEST_TIMING_LOG
+
+# Stages in pipeline order: parser stages, then the database load
+INGEST_STAGES = PARSE_STAGES + ['load']
+
+
+class TimingLog:
+    """Appends ingestion timing records to a JSON-lines file"""
+
+    def __init__(self, path=INGEST_TIMING_LOG):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def record(self, file_name, result=None, load_seconds=None, status='loaded', location_code=None):
+        """
+        Append the timing record for one parsed file
+        result is the parser result (None if parsing failed); its 'stats'
+        supply the parser stage times and sizes
+        """
+        stats = (result or {}).get('stats', {})
+        stages = dict(stats.get('stage_seconds', {}))
+        if load_seconds is not None:
+            stages['load'] = round(load_seconds, 4)
+
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'file_name': file_name,
+            'location_code': location_code or (result or {}).get('location_code'),
+            'status': status,
+            'tier': (result or {}).get('extraction_tier'),
+            'cached': stats.get('cached', False),
+            'pages': stats.get('pages'),
+            'tables_found': stats.get('tables_found'),
+            'items_matched': stats.get('items_matched'),
+            'bytes_read': stats.get('bytes_read'),
+            'stage_seconds': stages,
+            'total_seconds': round(sum(stages.values()), 4),
+        }
+        try:
+            with self.lock, open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print(f"Warning: Could not write timing log: {e}")
+
+    def records(self, since=None):
+        """
+        Load timing records, optionally only those at or after since (ISO date)
+        Returns: DataFrame with one row per record and one column per stage
+        """
+        rows = []
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        continue  # partial line from an interrupted write
+        except OSError:
+            pass
+
+        df = pd.json_normalize(rows)
+        if df.empty:
+            return df
+        df = df.rename(columns={f"stage_seconds.{stage}": stage for stage in INGEST_STAGES})
+        for stage in INGEST_STAGES:
+            if stage not in df:
+                df[stage] = 0.0
+        df[INGEST_STAGES] = df[INGEST_STAGES].fillna(0.0)
+        if since:
+            df = df[df['timestamp'] >= since]
+        return df
+
+
+def print_summary(df, slowest=10):
+    """Print stage percentiles and the slowest files"""
+    if df.empty:
+        print("No timing records")
+        return
+
+    loaded = df[df['status'] == 'loaded']
+    print(f"Files: {len(df)} ({len(loaded)} loaded, {len(df) - len(loaded)} failed, "
+          f"{int(loaded['cached'].sum())} from parse cache)")
+    print(f"From {df['timestamp'].min()} to {df['timestamp'].max()}")
+    if loaded.empty:
+        return
+
+    columns = INGEST_STAGES + ['total_seconds']
+    print(f"\n{'Stage':<14}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'sum':>10}")
+    for column in columns:
+        values = loaded[column]
+        print(f"{column:<14}{values.quantile(0.5):>9.3f}{values.quantile(0.9):>9.3f}"
+              f"{values.quantile(0.99):>9.3f}{values.max():>9.3f}{values.sum():>10.2f}")
+
+    print(f"\nBy extraction tier:")
+    for tier, group in loaded.groupby(loaded['tier'].fillna('-')):
+        print(f"  {tier:<10} {len(group):>5} files  p50 {group['total_seconds'].quantile(0.5):.3f}s  "
+              f"p90 {group['total_seconds'].quantile(0.9):.3f}s")
+
+    print(f"\nSlowest {min(slowest, len(loaded))} files:")
+    for _, row in loaded.nlargest(slowest, 'total_seconds').iterrows():
+        stages = "  ".join(f"{stage} {row[stage]:.2f}" for stage in INGEST_STAGES if row[stage] >= 0.005)
+        location = f" [{row['location_code']}]" if row.get('location_code') else ""
+        print(f"  {row['total_seconds']:>7.2f}s  {row['file_name']}{location}  "
+              f"{row['pages']:.0f} pages, {row['tables_found']:.0f} tables, {row['items_matched']:.0f} items  ({stages})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize ingestion timing records")
+    parser.add_argument('--since', help="Only records at or after this date (YYYY-MM-DD)")
+    parser.add_argument('--slowest', type=int, default=10, help="Number of slowest files to list")
+    args = parser.parse_args()
+
+    print_summary(TimingLog().records(args.since), args.slowest)